@@ -0,0 +1,175 @@
+import math
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Deque, AsyncIterator
+
+from fastapi import HTTPException
+
+from instrumentation import metrics
+
+class Overloaded(HTTPException):
+    """Request turned away by admission control, with a Retry-After hint in seconds"""
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(status_code, detail, headers={'Retry-After': str(retry_after)})
+
+class Ticket:
+    """One request's place in a lane: queued until granted is done, then holding a slot"""
+    __slots__ = ('granted', 'enqueued', 'started')
+    
+    def __init__(self):
+        self.granted = asyncio.get_running_loop().create_future()
+        self.enqueued = time.perf_counter()
+        self.started: Optional[float] = None
+
+class Lane:
+    """Admission control for one class of requests: a concurrency limit in front of a bounded queue
+    
+    Requests beyond the limit wait in FIFO order. When the queue is full they
+    are rejected at once with 429; when they wait longer than queue_timeout
+    they get 503. A lane created with yields_to starts nothing while that lane
+    has requests waiting, so e.g. ingestion jobs give way to questions.
+    """
+    def __init__(self,
+                 name: str,
+                 concurrency: int,
+                 queue_size: int,
+                 queue_timeout: Optional[float] = None,
+                 yields_to: Optional['Lane'] = None):
+        self.name = name
+        self.concurrency = max(concurrency, 1)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout  # None waits as long as it takes
+        self.yields_to = yields_to
+        self.yielding: List['Lane'] = []  # Lanes to wake when this one stops having waiters
+        if yields_to is not None:
+            yields_to.yielding.append(self)
+        
+        self.active = 0
+        self.waiters: Deque[Ticket] = deque()
+        self.service_time = 1.0  # Moving average of seconds a request holds its slot, for Retry-After
+        self.admitted = 0
+        self.rejected = {'queue_full': 0, 'timeout': 0}
+    
+    @property
+    def queued(self) -> int:
+        return len(self.waiters)
+    
+    def check(self) -> None:
+        """Raise Overloaded if a new request would be rejected right now, without claiming anything"""
+        if not self._can_start() and self.queued >= self.queue_size:
+            self.rejected['queue_full'] += 1
+            raise Overloaded(429, f"Too many {self.name} requests queued, retry later", self.retry_after())
+    
+    def reserve(self) -> Ticket:
+        """Claim a slot or a queue position without waiting; raises Overloaded when the queue is full
+        
+        Pass the ticket to wait(), and to release() once the work is over.
+        """
+        ticket = Ticket()
+        if self._can_start():
+            self._grant(ticket)
+        else:
+            self.check()
+            self.waiters.append(ticket)
+        return ticket
+    
+    async def wait(self, ticket: Ticket) -> None:
+        """Wait for a reserved slot, giving up with Overloaded after queue_timeout"""
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.granted), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not ticket.granted.done():
+                self._abandon(ticket)
+                self.rejected['timeout'] += 1
+                raise Overloaded(503, f"Timed out waiting for a {self.name} slot, retry later", self.retry_after())
+        except BaseException:
+            # Cancelled while queued: leave the queue, or give back the slot if it was granted meanwhile
+            self.release(ticket)
+            raise
+        # Recorded here rather than when granted, so it lands in this request's Server-Timing
+        if metrics.enabled:
+            metrics.record(f"queue.{self.name}", ticket.started - ticket.enqueued)
+    
+    def release(self, ticket: Ticket) -> None:
+        """Give up a ticket: hand its slot to the next waiter, or leave the queue if still waiting"""
+        if ticket.started is None:
+            if not ticket.granted.done():
+                self._abandon(ticket)
+            return
+        self.service_time += 0.2 * (time.perf_counter() - ticket.started - self.service_time)
+        ticket.started = None
+        self.active -= 1
+        self._wake()
+    
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Hold a slot of this lane for the duration of the block"""
+        ticket = self.reserve()
+        await self.wait(ticket)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+    
+    def retry_after(self) -> int:
+        """Seconds until the current backlog is likely to have drained"""
+        return max(1, math.ceil(self.service_time * (self.queued + 1) / self.concurrency))
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'active': self.active,
+            'concurrency': self.concurrency,
+            'queued': self.queued,
+            'queue_size': self.queue_size,
+            'admitted': self.admitted,
+            'rejected': dict(self.rejected),
+            'average_service_seconds': self.service_time
+        }
+    
+    def _can_start(self) -> bool:
+        if self.active >= self.concurrency:
+            return False
+        return self.yields_to is None or not self.yields_to.waiters
+    
+    def _grant(self, ticket: Ticket) -> None:
+        ticket.started = time.perf_counter()
+        ticket.granted.set_result(None)
+        self.active += 1
+        self.admitted += 1
+    
+    def _wake(self) -> None:
+        while self.waiters and self._can_start():
+            self._grant(self.waiters.popleft())
+        if not self.waiters:
+            for lane in self.yielding:
+                lane._wake()
+    
+    def _abandon(self, ticket: Ticket) -> None:
+        self.waiters.remove(ticket)
+        ticket.granted.cancel()
+        if not self.waiters:
+            for lane in self.yielding:
+                lane._wake()
+
+def render_prometheus(lanes: List[Lane]) -> str:
+    """Queue depth, active requests and rejections per lane in the Prometheus text format"""
+    lines = [
+        '# HELP askyourdoc_lane_active Requests currently holding a slot.',
+        '# TYPE askyourdoc_lane_active gauge'
+    ]
+    lines.extend(f'askyourdoc_lane_active{{lane="{lane.name}"}} {lane.active}' for lane in lanes)
+    lines.extend([
+        '# HELP askyourdoc_lane_queued Requests waiting for a slot.',
+        '# TYPE askyourdoc_lane_queued gauge'
+    ])
+    lines.extend(f'askyourdoc_lane_queued{{lane="{lane.name}"}} {lane.queued}' for lane in lanes)
+    lines.extend([
+        '# HELP askyourdoc_lane_rejected_total Requests turned away by admission control.',
+        '# TYPE askyourdoc_lane_rejected_total counter'
+    ])
+    for lane in lanes:
+        for reason, count in lane.rejected.items():
+            lines.append(f'askyourdoc_lane_rejected_total{{lane="{lane.name}",reason="{reason}"}} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,7 @@
+"""Benchmarks for document ingestion and question answering
+
+Run from the backend directory:
+    
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --output new.json --compare results.json
+"""
@@ -0,0 +1,65 @@
+import json
+import argparse
+from typing import Dict, Any, List
+
+# Metrics where a higher value is a regression, and the one where lower is
+LATENCY_METRICS = ['p50_ms', 'p95_ms', 'p99_ms']
+MEMORY_METRIC = 'peak_memory_bytes'
+THROUGHPUT_METRIC = 'throughput'
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """List metric changes between two runs, flagging those worse than threshold
+    
+    threshold is relative (0.1 = 10%). Benchmarks present in only one run are skipped.
+    """
+    changes = []
+    for name, result in current['benchmarks'].items():
+        before = baseline['benchmarks'].get(name)
+        if before is None:
+            continue
+        
+        for metric in LATENCY_METRICS + [MEMORY_METRIC, THROUGHPUT_METRIC]:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if metric == THROUGHPUT_METRIC else change
+            changes.append({
+                'benchmark': name,
+                'metric': metric,
+                'baseline': old,
+                'current': new,
+                'change': change,
+                'regression': worse > threshold
+            })
+    return changes
+
+def format_changes(changes: List[Dict[str, Any]]) -> str:
+    lines = [f"{'benchmark':<36} {'metric':<18} {'baseline':>14} {'current':>14} {'change':>8}"]
+    for change in changes:
+        marker = '  REGRESSION' if change['regression'] else ''
+        lines.append(
+            f"{change['benchmark']:<36} {change['metric']:<18} {change['baseline']:>14.2f} "
+            f"{change['current']:>14.2f} {change['change']:>+8.1%}{marker}"
+        )
+    return '\n'.join(lines)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change counted as a regression')
+    args = parser.parse_args()
+    
+    changes = compare_results(load_results(args.baseline), load_results(args.current), args.threshold)
+    print(format_changes(changes))
+    # Non-zero exit lets CI fail on regressions
+    return 1 if any(change['regression'] for change in changes) else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
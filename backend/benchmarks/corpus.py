@@ -0,0 +1,144 @@
+import os
+import random
+from typing import Dict, List
+
+from docx import Document
+
+# Vocabulary for generated text; a few recurring topics give questions something to match
+TOPIC_WORDS = [
+    'contract', 'liability', 'warranty', 'payment', 'invoice', 'termination', 'notice',
+    'confidential', 'license', 'software', 'delivery', 'schedule', 'insurance', 'damages',
+    'property', 'employee', 'customer', 'service', 'support', 'security', 'privacy', 'data',
+    'report', 'audit', 'budget', 'project', 'milestone', 'approval', 'quality', 'training'
+]
+FILLER_WORDS = [
+    'the', 'a', 'of', 'and', 'to', 'in', 'for', 'with', 'on', 'by', 'each', 'any', 'all',
+    'shall', 'must', 'may', 'will', 'within', 'under', 'after', 'before', 'between'
+]
+
+# Questions asked by the benchmarks, built from the same vocabulary
+QUESTIONS = [
+    'What is the limitation of liability for damages?',
+    'When is payment due after an invoice?',
+    'How can the contract be terminated with notice?',
+    'Which data is confidential under the privacy terms?',
+    'Who approves the project budget and milestones?',
+    'What warranty applies to the software license?',
+    'How often is the security audit report delivered?',
+    'What insurance must the service provider keep?'
+]
+
+class CorpusGenerator:
+    """Deterministic synthetic documents in every supported format
+    
+    The same seed and sizes always produce the same text, so results from
+    different runs measure the code rather than the input.
+    """
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+    
+    def paragraphs(self, count: int, sentences: int = 4) -> List[str]:
+        """Generate paragraphs of sentences mixing topic and filler words"""
+        rng = random.Random(self.seed)
+        paragraphs = []
+        for _ in range(count):
+            paragraph = []
+            for _ in range(sentences):
+                words = [
+                    rng.choice(TOPIC_WORDS) if rng.random() < 0.4 else rng.choice(FILLER_WORDS)
+                    for _ in range(rng.randint(8, 16))
+                ]
+                paragraph.append(' '.join(words).capitalize() + '.')
+            paragraphs.append(' '.join(paragraph))
+        return paragraphs
+    
+    def write_txt(self, path: str, paragraph_count: int) -> str:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n\n'.join(self.paragraphs(paragraph_count)))
+        return path
+    
+    def write_docx(self, path: str, paragraph_count: int) -> str:
+        document = Document()
+        for text in self.paragraphs(paragraph_count):
+            document.add_paragraph(text)
+        document.save(path)
+        return path
+    
+    def write_pdf(self, path: str, page_count: int, paragraphs_per_page: int = 3) -> str:
+        """Write a text PDF with one content stream per page
+        
+        The file is built by hand so the benchmarks need no PDF writing library.
+        """
+        texts = self.paragraphs(page_count * paragraphs_per_page)
+        pages = [
+            texts[number * paragraphs_per_page:(number + 1) * paragraphs_per_page]
+            for number in range(page_count)
+        ]
+        write_text_pdf(path, pages)
+        return path
+    
+    def generate(self, directory: str, paragraph_count: int = 200, page_count: int = 20) -> Dict[str, str]:
+        """Write one document per format and return their paths by MIME type"""
+        os.makedirs(directory, exist_ok=True)
+        return {
+            'text/plain': self.write_txt(os.path.join(directory, 'corpus.txt'), paragraph_count),
+            'application/vnd.openxmlformats-officedocument.wordprocessingml.document': self.write_docx(
+                os.path.join(directory, 'corpus.docx'), paragraph_count
+            ),
+            'application/pdf': self.write_pdf(os.path.join(directory, 'corpus.pdf'), page_count)
+        }
+
+def write_text_pdf(path: str, pages: List[List[str]], line_length: int = 90) -> None:
+    """Write a minimal PDF where each page lists its paragraphs as wrapped lines"""
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # Page tree, filled in once the page objects are numbered
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'
+    ]
+    page_ids = []
+    for paragraphs in pages:
+        lines = []
+        for text in paragraphs:
+            lines.extend(_wrap(text, line_length))
+            lines.append('')  # Blank line between paragraphs
+        commands = ['BT', '/F1 10 Tf', '12 TL', '50 780 Td']
+        commands.extend(f"({_escape(line)}) '" for line in lines)
+        commands.append('ET')
+        stream = '\n'.join(commands).encode('latin-1')
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % len(objects)
+        )
+        page_ids.append(len(objects))
+    kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids).encode('ascii')
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(page_ids))
+    
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref_offset = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref_offset)
+    
+    with open(path, 'wb') as f:
+        f.write(output)
+
+def _wrap(text: str, width: int) -> List[str]:
+    lines = []
+    line = ''
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
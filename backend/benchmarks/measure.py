@@ -0,0 +1,56 @@
+import time
+import tracemalloc
+from typing import Callable, Dict, Any, List, Optional
+
+import numpy as np
+
+def measure(func: Callable[[], Any],
+            iterations: int = 20,
+            warmup: int = 2,
+            units: Optional[Callable[[Any], float]] = None,
+            unit_name: str = 'calls') -> Dict[str, Any]:
+    """Time repeated calls of func and report latency percentiles, throughput and peak memory
+    
+    units maps a call's return value to the work it did (paragraphs, bytes...)
+    so throughput can be reported per unit instead of per call. Peak memory
+    comes from one extra traced call, keeping tracemalloc overhead out of the timings.
+    """
+    for _ in range(warmup):
+        func()
+    
+    latencies = []
+    total_units = 0.0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = func()
+        latencies.append(time.perf_counter() - start)
+        total_units += units(result) if units else 1
+    
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    return {
+        **summarize(latencies, total_units, unit_name),
+        'peak_memory_bytes': int(peak_memory)
+    }
+
+def summarize(latencies: List[float], total_units: Optional[float] = None, unit_name: str = 'calls') -> Dict[str, Any]:
+    """Latency percentiles in milliseconds and throughput for a list of durations in seconds"""
+    latencies_ms = np.array(latencies) * 1000
+    total_seconds = float(sum(latencies))
+    if total_units is None:
+        total_units = len(latencies)
+    return {
+        'iterations': len(latencies),
+        'mean_ms': float(latencies_ms.mean()),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'max_ms': float(latencies_ms.max()),
+        'throughput': total_units / total_seconds if total_seconds else 0.0,
+        'throughput_unit': f"{unit_name}/s"
+    }
@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import itertools
+import subprocess
+from datetime import datetime
+from typing import Dict, Any, Callable
+
+from benchmarks.corpus import CorpusGenerator, QUESTIONS
+from benchmarks.measure import measure
+from benchmarks.startup import benchmark_startup
+from benchmarks.compare import load_results, compare_results, format_changes
+
+# Corpus sizes: paragraphs for TXT/DOCX, pages for the PDF
+SCALES = {
+    'small': {'paragraphs': 200, 'pages': 20},
+    'medium': {'paragraphs': 2000, 'pages': 100},
+    'large': {'paragraphs': 10000, 'pages': 500}
+}
+
+FORMAT_NAMES = {
+    'text/plain': 'txt',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': 'docx',
+    'application/pdf': 'pdf'
+}
+
+def benchmark_extraction(paths: Dict[str, str], iterations: int) -> Dict[str, Dict[str, Any]]:
+    """TextProcessor.extract_text_with_metadata for each format, in this process"""
+    from text_processor import TextProcessor
+    
+    text_processor = TextProcessor()
+    results = {}
+    for mime_type, path in paths.items():
+        results[f"extract.{FORMAT_NAMES[mime_type]}"] = measure(
+            lambda: text_processor.extract_text_with_metadata(path, mime_type),
+            iterations,
+            units=lambda data: len(data['paragraphs']),
+            unit_name='paragraphs'
+        )
+    return results
+
+def benchmark_search(path: str, iterations: int) -> Dict[str, Dict[str, Any]]:
+    """SimilaritySearch.find_relevant_paragraphs with every scorer, with and without a prebuilt index"""
+    from text_processor import TextProcessor
+    from similarity_search import SimilaritySearch
+    
+    paragraphs = TextProcessor().extract_text_with_metadata(path, 'text/plain')['paragraphs']
+    similarity_search = SimilaritySearch()
+    index = similarity_search.build_index(paragraphs)
+    questions = itertools.cycle(QUESTIONS)
+    
+    results = {
+        'search.build_index': measure(
+            lambda: similarity_search.build_index(paragraphs),
+            iterations,
+            units=lambda _: len(paragraphs),
+            unit_name='paragraphs'
+        )
+    }
+    for scorer in similarity_search.scorers:
+        results[f"search.{scorer}"] = measure(
+            lambda: similarity_search.find_relevant_paragraphs(
+                next(questions), paragraphs, index=index, scorer=scorer
+            ),
+            iterations,
+            unit_name='questions'
+        )
+    results['search.tfidf_unindexed'] = measure(
+        lambda: similarity_search.find_relevant_paragraphs(next(questions), paragraphs, scorer='tfidf'),
+        iterations,
+        unit_name='questions'
+    )
+    return results
+
+def configure_app(work_dir: str) -> None:
+    """Give the app its own upload directory and disable the question cache
+    
+    Repeated questions then measure scoring rather than cache hits. config
+    reads the environment once, on the first backend import, so this must
+    run before any benchmark group.
+    """
+    os.environ['ASKYOURDOC_UPLOAD_DIR'] = os.path.join(work_dir, 'uploads')
+    os.environ['ASKYOURDOC_QUERY_CACHE_SIZE'] = '0'
+
+def benchmark_endpoints(paths: Dict[str, str], iterations: int) -> Dict[str, Dict[str, Any]]:
+    """The FastAPI endpoints through an in-process test client, configured by configure_app"""
+    from fastapi.testclient import TestClient
+    import main
+    
+    with open(paths['text/plain'], 'rb') as f:
+        text = f.read()
+    uploads = itertools.count()
+    questions = itertools.cycle(QUESTIONS)
+    
+    def upload(content: bytes, filename: str, mime_type: str) -> Dict[str, Any]:
+        response = client.post(
+            '/upload', params={'wait': 'true'}, files={'file': (filename, content, mime_type)}
+        )
+        response.raise_for_status()
+        return response.json()
+    
+    def upload_unique() -> Dict[str, Any]:
+        # Identical uploads are deduplicated, so every call gets distinct content
+        content = text + f"\n\nBenchmark upload number {next(uploads)}.".encode('utf-8')
+        return upload(content, 'corpus.txt', 'text/plain')
+    
+    def post(path: str, payload: Dict[str, Any]) -> Callable[[], Any]:
+        def call():
+            response = client.post(path, json=payload(next(questions)))
+            response.raise_for_status()
+            return response
+        return call
+    
+    results = {}
+    with TestClient(main.app) as client:
+        results['endpoint.upload_txt'] = measure(
+            upload_unique, iterations, warmup=1,
+            units=lambda data: data['total_paragraphs'], unit_name='paragraphs'
+        )
+        document_ids = [
+            upload(open(path, 'rb').read(), os.path.basename(path), mime_type)['document_id']
+            for mime_type, path in paths.items()
+        ]
+        
+        results['endpoint.ask'] = measure(
+            post('/ask', lambda question: {'question': question, 'document_id': document_ids[0]}),
+            iterations, unit_name='questions'
+        )
+        results['endpoint.ask_compact'] = measure(
+            post('/ask', lambda question: {
+                'question': question, 'document_id': document_ids[0], 'response_format': 'compact'
+            }),
+            iterations, unit_name='questions'
+        )
+        results['endpoint.ask_batch'] = measure(
+            post('/ask/batch', lambda _: {'questions': QUESTIONS, 'document_ids': document_ids}),
+            iterations,
+            units=lambda _: len(QUESTIONS) * len(document_ids),
+            unit_name='questions'
+        )
+        results['endpoint.search'] = measure(
+            post('/search', lambda question: {'question': question}),
+            iterations, unit_name='questions'
+        )
+    return results
+
+def environment() -> Dict[str, Any]:
+    """Describe where results came from so runs on different machines are not mistaken for regressions"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark document ingestion and question answering')
+    parser.add_argument('--scale', choices=SCALES, default='small', help='Synthetic corpus size')
+    parser.add_argument('--paragraphs', type=int, help='Override paragraphs per TXT/DOCX document')
+    parser.add_argument('--pages', type=int, help='Override pages in the PDF document')
+    parser.add_argument('--iterations', type=int, default=20, help='Timed calls per benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='Corpus generator seed')
+    parser.add_argument('--only', choices=['extraction', 'search', 'endpoints', 'startup'], action='append',
+                        help='Run only these groups (repeatable)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Compare against an earlier results file')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change counted as a regression')
+    args = parser.parse_args()
+    
+    sizes = dict(SCALES[args.scale])
+    if args.paragraphs:
+        sizes['paragraphs'] = args.paragraphs
+    if args.pages:
+        sizes['pages'] = args.pages
+    groups = args.only or ['extraction', 'search', 'endpoints', 'startup']
+    
+    work_dir = tempfile.mkdtemp(prefix='askyourdoc-bench-')
+    configure_app(work_dir)
+    try:
+        paths = CorpusGenerator(args.seed).generate(
+            os.path.join(work_dir, 'corpus'), sizes['paragraphs'], sizes['pages']
+        )
+        benchmarks = {}
+        if 'extraction' in groups:
+            benchmarks.update(benchmark_extraction(paths, args.iterations))
+        if 'search' in groups:
+            benchmarks.update(benchmark_search(paths['text/plain'], args.iterations))
+        if 'endpoints' in groups:
+            benchmarks.update(benchmark_endpoints(paths, args.iterations))
+        if 'startup' in groups:
+            benchmarks.update(benchmark_startup(paths['text/plain'], args.iterations, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    results = {
+        'environment': environment(),
+        'parameters': {'seed': args.seed, 'iterations': args.iterations, **sizes},
+        'benchmarks': benchmarks
+    }
+    
+    print(f"{'benchmark':<36} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'throughput':>24} {'peak MiB':>9}")
+    for name, result in benchmarks.items():
+        print(
+            f"{name:<36} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f} {result['p99_ms']:>10.2f} "
+            f"{result['throughput']:>12.1f} {result['throughput_unit']:<11} "
+            f"{result['peak_memory_bytes'] / 2 ** 20:>9.2f}"
+        )
+        if 'heavy_modules_loaded' in result:
+            print(f"{'':<36} heavy modules loaded: {', '.join(result['heavy_modules_loaded']) or 'none'}")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    
+    if args.compare:
+        changes = compare_results(load_results(args.compare), results, args.threshold)
+        print()
+        print(format_changes(changes))
+        if any(change['regression'] for change in changes):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
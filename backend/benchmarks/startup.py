@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import subprocess
+from typing import Dict, Any
+
+from benchmarks.measure import summarize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that should only be imported by processes that need them
+HEAVY_MODULES = ['pdfplumber', 'PyPDF2', 'docx', 'sklearn']
+
+# Runs in a fresh interpreter: time the app import, the first health check and the first question
+STARTUP_SCRIPT = '''
+import sys, json, time, resource
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient  # Test harness only, kept out of the timings
+heavy = %(heavy)r
+entered = time.perf_counter()
+with TestClient(main.app) as client:
+    client.get('/').raise_for_status()
+    healthy = time.perf_counter()
+    modules_after_health = [m for m in heavy if m in sys.modules]
+    client.post('/ask', json={'question': %(question)r, 'document_id': %(document_id)r}).raise_for_status()
+    answered = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'health': imported - start + healthy - entered,
+    'first_ask': imported - start + answered - entered,
+    'modules_after_health': modules_after_health,
+    'modules_after_ask': [m for m in heavy if m in sys.modules],
+    'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+}))
+'''
+
+def prepare_store(upload_dir: str, text_path: str) -> str:
+    """Ingest one TXT document in this process and return its ID"""
+    from document_manager import DocumentManager
+    from ingestion import ingest_document
+    
+    document_manager = DocumentManager(upload_dir)
+    with open(text_path, 'rb') as f:
+        content_hash, file_path = document_manager.save_document(f.read(), 'corpus.txt')
+    document_id = document_manager.generate_document_id(content_hash, 'corpus.txt')
+    ingest_document(upload_dir, document_id, content_hash, file_path, 'text/plain', 'corpus.txt')
+    return document_id
+
+def benchmark_startup(text_path: str, iterations: int, work_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Cold start of the API in fresh interpreters, against a store holding one document
+    
+    Reports the time to import main, to answer the first health check and to
+    answer the first question, plus which heavy libraries each step loaded.
+    """
+    upload_dir = os.path.join(work_dir, 'startup-uploads')
+    script = STARTUP_SCRIPT % {
+        'heavy': HEAVY_MODULES,
+        'question': 'What is the limitation of liability for damages?',
+        'document_id': prepare_store(upload_dir, text_path)
+    }
+    env = {**os.environ, 'ASKYOURDOC_UPLOAD_DIR': upload_dir, 'ASKYOURDOC_QUERY_CACHE_SIZE': '0'}
+    
+    runs = []
+    for _ in range(iterations):
+        completed = subprocess.run(
+            [sys.executable, '-c', script], cwd=BACKEND_DIR, env=env,
+            capture_output=True, text=True, check=True
+        )
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    
+    max_rss = max(run['max_rss_bytes'] for run in runs)
+    results = {}
+    for step, modules in [('import', None), ('health', 'modules_after_health'), ('first_ask', 'modules_after_ask')]:
+        result = summarize([run[step] for run in runs], unit_name='starts')
+        result['peak_memory_bytes'] = max_rss  # Peak RSS of the whole process
+        if modules:
+            result['heavy_modules_loaded'] = runs[-1][modules]
+        results[f"startup.{step}"] = result
+    return results
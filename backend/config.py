@@ -0,0 +1,56 @@
+import os
+
+# Number of worker processes used to extract and index uploaded documents
+INGESTION_WORKERS = int(os.environ.get('ASKYOURDOC_INGESTION_WORKERS', os.cpu_count() or 1))
+
+# Directory holding uploaded files and the document store
+UPLOAD_DIR = os.environ.get('ASKYOURDOC_UPLOAD_DIR', 'uploads')
+
+# PDFs with more pages than this are split into page ranges extracted in parallel
+PDF_PAGES_PER_CHUNK = int(os.environ.get('ASKYOURDOC_PDF_PAGES_PER_CHUNK', 50))
+
+# Uploads are streamed to disk in chunks of this size and rejected past the maximum
+UPLOAD_CHUNK_SIZE = int(os.environ.get('ASKYOURDOC_UPLOAD_CHUNK_SIZE', 1024 * 1024))
+MAX_UPLOAD_SIZE = int(os.environ.get('ASKYOURDOC_MAX_UPLOAD_SIZE', 500 * 1024 * 1024))
+
+# Ranking method used when a request does not choose one: tfidf, bm25, keyword, semantic or hybrid
+DEFAULT_SCORER = os.environ.get('ASKYOURDOC_SCORER', 'tfidf')
+
+# Dense LSA vectors built at upload for the semantic and hybrid scorers (0 skips them),
+# IVF clusters each semantic query visits, and the LSA share of hybrid scores
+LSA_DIMENSIONS = int(os.environ.get('ASKYOURDOC_LSA_DIMENSIONS', 100))
+IVF_PROBES = int(os.environ.get('ASKYOURDOC_IVF_PROBES', 8))
+HYBRID_WEIGHT = float(os.environ.get('ASKYOURDOC_HYBRID_WEIGHT', 0.5))
+
+# Question result cache: maximum entries (0 disables it) and time to live in seconds
+QUERY_CACHE_SIZE = int(os.environ.get('ASKYOURDOC_QUERY_CACHE_SIZE', 1024))
+QUERY_CACHE_TTL = float(os.environ.get('ASKYOURDOC_QUERY_CACHE_TTL', 300))
+
+# Per-stage timing for /metrics and the Server-Timing header (0 turns it off)
+METRICS_ENABLED = os.environ.get('ASKYOURDOC_METRICS', '1') != '0'
+
+# Optional 'module:function' called with each stage name; may return a context manager
+# wrapped around the stage, e.g. to drive a sampling profiler
+PROFILER_HOOK = os.environ.get('ASKYOURDOC_PROFILER_HOOK')
+
+# Libraries to load in the background at startup instead of on first use:
+# comma-separated 'search', 'ingestion' or 'all'. Off by default, so a replica
+# only ever imports what its requests need.
+WARMUP = {part.strip() for part in os.environ.get('ASKYOURDOC_WARMUP', '').split(',') if part.strip()}
+
+# API worker processes when started with `python main.py` (uvicorn --workers works too).
+# Every worker runs its own pool of INGESTION_WORKERS, so lower that when raising this.
+API_WORKERS = int(os.environ.get('ASKYOURDOC_WORKERS', 1))
+
+# Admission control for questions (/ask, /ask/batch, /search): requests scored at once,
+# how many may wait (429 beyond that) and for how long in seconds (then 503)
+QUERY_CONCURRENCY = int(os.environ.get('ASKYOURDOC_QUERY_CONCURRENCY', 4))
+QUERY_QUEUE_SIZE = int(os.environ.get('ASKYOURDOC_QUERY_QUEUE_SIZE', 64))
+QUERY_QUEUE_TIMEOUT = float(os.environ.get('ASKYOURDOC_QUERY_QUEUE_TIMEOUT', 2.0))
+
+# Admission control for uploads: ingestion jobs running at once and jobs waiting (429 beyond
+# that). Waiting jobs start only while no question is queued, and the ingestion workers run
+# at this much lower CPU priority (nice increment, 0 keeps the API's priority).
+INGESTION_CONCURRENCY = int(os.environ.get('ASKYOURDOC_INGESTION_CONCURRENCY', INGESTION_WORKERS))
+INGESTION_QUEUE_SIZE = int(os.environ.get('ASKYOURDOC_INGESTION_QUEUE_SIZE', 32))
+INGESTION_NICE = int(os.environ.get('ASKYOURDOC_INGESTION_NICE', 10))
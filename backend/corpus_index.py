@@ -0,0 +1,165 @@
+import re
+import math
+import heapq
+import sqlite3
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, FrozenSet
+
+from paragraph_table import ParagraphTable
+from document_store import BUSY_TIMEOUT
+
+# Same token rules as the per-document TF-IDF analyzer (unigrams only)
+TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+
+# Postings written or deleted per transaction, so other writers never wait long for the lock
+POSTINGS_BATCH = 20000
+
+@lru_cache(maxsize=None)
+def stop_words() -> FrozenSet[str]:
+    """scikit-learn's English stop words, imported on first use since scikit-learn is slow to import"""
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return ENGLISH_STOP_WORDS
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without English stop words"""
+    excluded = stop_words()
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in excluded]
+
+def _delete_postings(connection: sqlite3.Connection, content_hash: str) -> int:
+    """Delete up to POSTINGS_BATCH postings of one content, returning how many went"""
+    return connection.execute(
+        'DELETE FROM postings WHERE rowid IN (SELECT rowid FROM postings WHERE content_hash = ? LIMIT ?)',
+        (content_hash, POSTINGS_BATCH)
+    ).rowcount
+
+class CorpusIndex:
+    """Global inverted index over the paragraphs of all stored content
+    
+    Entries are keyed by content hash, so duplicate uploads are indexed once.
+    """
+    def __init__(self, db_path: str, initialize: bool = True):
+        self.db_path = db_path
+        if initialize:
+            self._init_db()
+    
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT)
+    
+    def _init_db(self) -> None:
+        with self._connect() as connection:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS corpus_contents (
+                    content_hash TEXT PRIMARY KEY,
+                    total_paragraphs INTEGER NOT NULL
+                )
+            ''')
+            # One row per (term, paragraph); paragraph is the row position within the content
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    paragraph INTEGER NOT NULL,
+                    tf INTEGER NOT NULL,
+                    length INTEGER NOT NULL
+                )
+            ''')
+            connection.execute('CREATE INDEX IF NOT EXISTS postings_term ON postings (term)')
+            connection.execute('CREATE INDEX IF NOT EXISTS postings_content ON postings (content_hash)')
+    
+    def add_content(self, content_hash: str, paragraphs: ParagraphTable) -> None:
+        """Insert postings for every paragraph of stored content
+        
+        Large content is committed in batches of postings. Searches only see
+        the postings of content listed in corpus_contents, whose row goes in
+        with the last batch, so they never see part of a content.
+        """
+        rows = []
+        for position, text in enumerate(paragraphs.texts()):
+            tokens = tokenize(text)
+            for term, tf in Counter(tokens).items():
+                rows.append((term, content_hash, position, tf, len(tokens)))
+        
+        # Left over by an earlier or interrupted add
+        with self._connect() as connection:
+            indexed_before = connection.execute(
+                'SELECT 1 FROM postings WHERE content_hash = ? LIMIT 1', (content_hash,)
+            ).fetchone()
+        if indexed_before:
+            self.remove_content(content_hash)
+        
+        batches = [rows[start:start + POSTINGS_BATCH] for start in range(0, len(rows), POSTINGS_BATCH)] or [[]]
+        for batch in batches[:-1]:
+            with self._connect() as connection:
+                connection.executemany('INSERT INTO postings VALUES (?, ?, ?, ?, ?)', batch)
+        with self._connect() as connection:
+            connection.executemany('INSERT INTO postings VALUES (?, ?, ?, ?, ?)', batches[-1])
+            connection.execute(
+                'INSERT OR REPLACE INTO corpus_contents VALUES (?, ?)',
+                (content_hash, len(paragraphs))
+            )
+    
+    def remove_content(self, content_hash: str) -> None:
+        """Drop all postings of stored content, hiding it from searches with the first batch"""
+        with self._connect() as connection:
+            connection.execute('DELETE FROM corpus_contents WHERE content_hash = ?', (content_hash,))
+            deleted = _delete_postings(connection, content_hash)
+        while deleted == POSTINGS_BATCH:
+            with self._connect() as connection:
+                deleted = _delete_postings(connection, content_hash)
+    
+    def indexed_contents(self) -> List[str]:
+        with self._connect() as connection:
+            return [row[0] for row in connection.execute('SELECT content_hash FROM corpus_contents')]
+    
+    def count_paragraphs(self, content_hashes: Optional[List[str]] = None) -> int:
+        """Number of paragraphs in the whole corpus or in the given content"""
+        query = 'SELECT COALESCE(SUM(total_paragraphs), 0) FROM corpus_contents'
+        params: List[str] = []
+        if content_hashes is not None:
+            query += f" WHERE content_hash IN ({', '.join('?' for _ in content_hashes)})"
+            params = list(content_hashes)
+        with self._connect() as connection:
+            return connection.execute(query, params).fetchone()[0]
+    
+    def search(self, query: str, top_k: int = 5,
+               content_hashes: Optional[List[str]] = None) -> List[Tuple[str, int, float]]:
+        """Rank paragraphs by TF-IDF using only the postings of the query terms"""
+        terms = sorted(set(tokenize(query)))
+        if not terms or content_hashes == []:
+            return []
+        
+        term_placeholders = ', '.join('?' for _ in terms)
+        with self._connect() as connection:
+            total = self.count_paragraphs()
+            # Postings of content still being added or removed are not listed in corpus_contents
+            indexed = 'content_hash IN (SELECT content_hash FROM corpus_contents)'
+            document_frequency = dict(connection.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({term_placeholders}) AND {indexed} "
+                f"GROUP BY term",
+                terms
+            ).fetchall())
+            
+            postings_query = (
+                f"SELECT term, content_hash, paragraph, tf, length FROM postings "
+                f"WHERE term IN ({term_placeholders}) AND {indexed}"
+            )
+            params = list(terms)
+            if content_hashes is not None:
+                postings_query += f" AND content_hash IN ({', '.join('?' for _ in content_hashes)})"
+                params.extend(content_hashes)
+            postings = connection.execute(postings_query, params).fetchall()
+        
+        # Smoothed IDF, matching the per-document vectorizer
+        idf = {
+            term: math.log((1 + total) / (1 + df)) + 1
+            for term, df in document_frequency.items()
+        }
+        max_score = sum(idf.values())
+        
+        scores: Dict[Tuple[str, int], float] = defaultdict(float)
+        for term, content_hash, paragraph, tf, length in postings:
+            scores[(content_hash, paragraph)] += (1 + math.log(tf)) * idf[term] / math.sqrt(length)
+        
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(content_hash, paragraph, score / max_score) for (content_hash, paragraph), score in best]
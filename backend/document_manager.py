@@ -1,82 +1,333 @@
 import os
 import uuid
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import hashlib
 
+from document_store import DocumentStore
+from corpus_index import CorpusIndex
+from query_cache import QueryCache
+from similarity_search import SearchIndex
+from paragraph_table import ParagraphTable
+from instrumentation import metrics
+
+class UploadTooLargeError(ValueError):
+    pass
+
+class EmptyUploadError(ValueError):
+    pass
+
 class DocumentManager:
-    def __init__(self, upload_dir: str = "uploads"):
+    def __init__(self,
+                 upload_dir: str = "uploads",
+                 store_dir: Optional[str] = None,
+                 query_cache: Optional[QueryCache] = None,
+                 initialize: bool = True):
+        """Pass initialize=False in processes opening a store another process has already set up"""
         self.upload_dir = upload_dir
-        self.documents = {}  # In production, use a database
         os.makedirs(upload_dir, exist_ok=True)
+        self.store = DocumentStore(store_dir or os.path.join(upload_dir, "store"), initialize)
+        self.documents = {}  # Document metadata loaded so far
+        self.contents = {}  # Processed content loaded so far, shared by duplicate documents
+        self.partial = {}  # Snapshots of documents still being ingested, by this or another process
+        self.corpus_index = CorpusIndex(self.store.db_path, initialize)
+        self.query_cache = query_cache  # Invalidated when content is deleted
+        # Deletions by other processes sharing the store are replayed from here on
+        self.last_deletion = self.store.last_deletion()
+        if initialize:
+            self._backfill_corpus_index()
     
-    def generate_document_id(self, file_content: bytes, original_filename: str) -> str:
-        """Generate unique document ID using content hash and timestamp"""
-        content_hash = hashlib.md5(file_content).hexdigest()[:8]
+    def _backfill_corpus_index(self) -> None:
+        """Index stored content that predates the corpus index"""
+        indexed = set(self.corpus_index.indexed_contents())
+        for content_hash in self.store.list_content_hashes():
+            if content_hash not in indexed:
+                stored = self.store.load_content(content_hash)
+                self.corpus_index.add_content(content_hash, stored['paragraphs'])
+    
+    def generate_document_id(self, content_hash: str, original_filename: str) -> str:
+        """Generate unique document ID using content hash, timestamp and a random suffix"""
         timestamp = str(int(datetime.now().timestamp()))[-6:]
-        return f"doc_{content_hash}_{timestamp}"
+        # Identical uploads share a hash, so the suffix keeps their aliases apart
+        return f"doc_{content_hash[:8]}_{timestamp}{uuid.uuid4().hex[:4]}"
     
-    def save_document(self, file_content: bytes, original_filename: str) -> str:
-        """Save document and return unique ID"""
-        document_id = self.generate_document_id(file_content, original_filename)
+    def _content_path(self, content_hash: str, original_filename: str) -> str:
         file_extension = os.path.splitext(original_filename)[1]
-        filename = f"{document_id}{file_extension}"
-        file_path = os.path.join(self.upload_dir, filename)
+        return os.path.join(self.upload_dir, f"{content_hash}{file_extension}")
+    
+    def save_document(self, file_content: bytes, original_filename: str) -> Tuple[str, str]:
+        """Save document content and return its hash and path"""
+        content_hash = hashlib.sha256(file_content).hexdigest()
+        stored = self.store.get_content(content_hash)
+        if stored is not None:
+            return content_hash, stored['file_path']
         
+        file_path = self._content_path(content_hash, original_filename)
         with open(file_path, "wb") as f:
             f.write(file_content)
         
-        return document_id, file_path
+        return content_hash, file_path
+    
+    async def save_document_stream(self,
+                                   upload: Any,
+                                   original_filename: str,
+                                   max_size: int,
+                                   chunk_size: int = 1024 * 1024) -> Tuple[str, str, int]:
+        """Stream an upload to disk chunk by chunk, hashing it on the way
+        
+        `upload` is anything with an async read(size), such as FastAPI's UploadFile.
+        Returns the content hash, file path and size in bytes. Content that is
+        already stored is not written a second time.
+        """
+        content_hash = hashlib.sha256()
+        size = 0
+        tmp_path = os.path.join(self.upload_dir, f".upload-{uuid.uuid4().hex}.part")
+        
+        try:
+            with metrics.stage('upload.write'), open(tmp_path, "wb") as f:
+                while True:
+                    chunk = await upload.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_size:
+                        raise UploadTooLargeError(f"File exceeds the maximum size of {max_size} bytes")
+                    content_hash.update(chunk)
+                    f.write(chunk)
+            
+            if size == 0:
+                raise EmptyUploadError("File is empty")
+            
+            content_hash = content_hash.hexdigest()
+            stored = self.store.get_content(content_hash)
+            if stored is not None:
+                os.remove(tmp_path)
+                return content_hash, stored['file_path'], size
+            
+            file_path = self._content_path(content_hash, original_filename)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        
+        return content_hash, file_path, size
+    
+    def add_duplicate_document(self,
+                               document_id: str,
+                               content_hash: str,
+                               original_filename: str) -> Optional[Dict[str, Any]]:
+        """Register a new document for content that is already processed
+        
+        Returns the document summary, or None if the content still needs processing.
+        """
+        content = self.store.get_content(content_hash)
+        if content is None:
+            return None
+        
+        self.store.add_document({
+            'document_id': document_id,
+            'content_hash': content_hash,
+            'original_filename': original_filename,
+            'document_title': content['document_title'],
+            'upload_time': datetime.now().isoformat()
+        })
+        return {
+            'document_id': document_id,
+            'document_title': content['document_title'],
+            'original_filename': original_filename,
+            'total_paragraphs': content['total_paragraphs'],
+            'total_pages': content['total_pages']
+        }
     
     def store_document_metadata(self, 
                               document_id: str, 
                               original_filename: str,
                               extracted_data: Dict[str, Any],
-                              first_sentence: str) -> None:
-        """Store document metadata and processed content"""
-        self.documents[document_id] = {
+                              first_sentence: str,
+                              search_index: Optional[Any] = None,
+                              content_hash: Optional[str] = None,
+                              file_path: Optional[str] = None) -> None:
+        """Store document metadata and processed content
+        
+        Runs in ingestion workers, which never answer questions, so nothing is
+        kept in memory here; readers map the stored content on first access.
+        """
+        paragraphs = ParagraphTable.from_paragraphs(extracted_data.get('paragraphs', []))
+        if content_hash is None:
+            content_hash = hashlib.sha256(extracted_data.get('full_text', '').encode('utf-8')).hexdigest()
+        
+        # Concurrent uploads of the same bytes may all get here; only the one claiming the content indexes it
+        if self.store.get_content(content_hash) is None:
+            with metrics.stage('store.save'):
+                claimed = self.store.save_content(
+                    {
+                        'content_hash': content_hash,
+                        'document_title': first_sentence,  # Using first sentence as title
+                        'file_size': extracted_data.get('file_size', 0),
+                        'total_paragraphs': len(paragraphs),
+                        'total_pages': extracted_data.get('total_pages', 0),
+                        'file_path': file_path
+                    },
+                    paragraphs,
+                    search_index.to_data() if search_index is not None else None
+                )
+            if claimed:
+                with metrics.stage('store.corpus_index'):
+                    self.corpus_index.add_content(content_hash, paragraphs)
+        
+        self.add_duplicate_document(document_id, content_hash, original_filename)
+    
+    def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Retrieve document by ID, loading its content from the store on first access"""
+        self.sync_deletions()
+        metadata = self.documents.get(document_id)
+        if metadata is None:
+            metadata = self.store.get_metadata(document_id)
+            if metadata is None:
+                return self._get_partial(document_id)
+            self.documents[document_id] = metadata
+            self.partial.pop(document_id, None)
+        
+        return {**metadata, **self._get_content(metadata['content_hash'])}
+    
+    def sync_deletions(self) -> None:
+        """Drop cached documents, content and answers deleted by any process sharing the store"""
+        for seq, document_id, content_hash, orphaned in self.store.deletions_since(self.last_deletion):
+            self.documents.pop(document_id, None)
+            if orphaned:
+                self.contents.pop(content_hash, None)
+                if self.query_cache is not None:
+                    self.query_cache.invalidate(content_hash)
+            self.last_deletion = seq
+    
+    def _get_content(self, content_hash: str) -> Dict[str, Any]:
+        content = self.contents.get(content_hash)
+        if content is None:
+            with metrics.stage('store.load'):
+                stored = self.store.load_content(content_hash)
+                index_data = stored['index_data']
+                content = {
+                    'paragraphs': stored['paragraphs'],
+                    'search_index': SearchIndex.from_data(index_data) if index_data else None
+                }
+            self.contents[content_hash] = content
+        return content
+    
+    def _get_partial(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Latest snapshot of a document still being ingested, memory-mapped from the store"""
+        for _ in range(3):
+            row = self.store.get_partial(document_id)
+            if row is None:
+                self.partial.pop(document_id, None)
+                return None
+            
+            document = self.partial.get(document_id)
+            if document is not None and document['generation'] >= row['generation']:
+                return document
+            
+            try:
+                stored = self.store.load_partial(document_id, row['generation'])
+            except FileNotFoundError:
+                continue  # Replaced by a newer snapshot while reading the row
+            index_data = stored['index_data']
+            document = {
+                **row,
+                'paragraphs': stored['paragraphs'],
+                'search_index': SearchIndex.from_data(index_data) if index_data else None
+            }
+            self.partial[document_id] = document
+            return document
+        return self.partial.get(document_id)
+    
+    def start_partial_document(self,
+                               document_id: str,
+                               content_hash: str,
+                               original_filename: str,
+                               file_path: str,
+                               total_pages: int) -> None:
+        """Make a document visible to get_document, in every process, before its ingestion finishes"""
+        document = {
             'document_id': document_id,
+            'content_hash': content_hash,
             'original_filename': original_filename,
-            'document_title': first_sentence,  # Using first sentence as title
+            'document_title': original_filename,  # Until the first page with text arrives
             'upload_time': datetime.now().isoformat(),
-            'file_size': extracted_data.get('file_size', 0),
-            'total_paragraphs': len(extracted_data.get('paragraphs', [])),
-            'total_pages': extracted_data.get('total_pages', 0),
-            'paragraphs': extracted_data.get('paragraphs', []),
-            'full_text': extracted_data.get('full_text', '')
+            'file_size': os.path.getsize(file_path),
+            'total_paragraphs': 0,
+            'total_pages': total_pages,
+            'file_path': file_path,
+            'paragraphs': [],
+            'search_index': None,
+            'pages_covered': 0,
+            'generation': 0,
+            'owner': self.store.owner
         }
+        self.store.save_partial(document, ParagraphTable.from_paragraphs([]))
+        self.partial[document_id] = document
     
-    def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
-        """Retrieve document by ID"""
-        return self.documents.get(document_id)
+    def update_partial_document(self,
+                                document_id: str,
+                                paragraphs: List[Dict[str, Any]],
+                                search_index: Optional[SearchIndex],
+                                pages_covered: int,
+                                document_title: Optional[str] = None) -> None:
+        """Publish the paragraphs and index of the pages extracted so far"""
+        document = self.partial.get(document_id)
+        if document is None:
+            return
+        # Replaced as a whole, so readers never pair paragraphs with an index from another batch
+        document = {
+            **document,
+            'document_title': document_title or document['document_title'],
+            'total_paragraphs': len(paragraphs),
+            'paragraphs': paragraphs,
+            'search_index': search_index,
+            'pages_covered': pages_covered,
+            'generation': document['generation'] + 1
+        }
+        with metrics.stage('store.save_partial'):
+            self.store.save_partial(
+                document,
+                ParagraphTable.from_paragraphs(paragraphs),
+                search_index.to_data() if search_index is not None else None
+            )
+        self.partial[document_id] = document
+    
+    def finish_partial_document(self, document_id: str) -> None:
+        """Stop serving a partial document, once it is stored or its ingestion failed"""
+        self.partial.pop(document_id, None)
+        self.store.delete_partial(document_id)
     
     def get_all_documents(self) -> List[Dict[str, Any]]:
         """Get list of all documents (minimal info)"""
         return [
             {
-                'document_id': doc_id,
+                'document_id': doc['document_id'],
                 'original_filename': doc['original_filename'],
                 'document_title': doc['document_title'],
                 'upload_time': doc['upload_time'],
                 'total_paragraphs': doc['total_paragraphs'],
                 'total_pages': doc['total_pages']
             }
-            for doc_id, doc in self.documents.items()
+            for doc in self.store.list_metadata()
         ]
     
     def delete_document(self, document_id: str) -> bool:
-        """Delete document and its metadata"""
-        if document_id in self.documents:
+        """Delete document; its content goes with the last document referencing it"""
+        deleted, orphaned_content = self.store.delete(document_id)
+        if not deleted:
+            return False
+        
+        self.documents.pop(document_id, None)
+        if orphaned_content is not None:
             # Remove physical file
-            doc = self.documents[document_id]
-            file_extension = os.path.splitext(doc['original_filename'])[1]
-            file_path = os.path.join(self.upload_dir, f"{document_id}{file_extension}")
-            
-            if os.path.exists(file_path):
+            file_path = orphaned_content['file_path']
+            if file_path and os.path.exists(file_path):
                 os.remove(file_path)
             
-            # Remove from memory
-            del self.documents[document_id]
-            return True
-        
-        return False
\ No newline at end of file
+            self.corpus_index.remove_content(orphaned_content['content_hash'])
+            self.contents.pop(orphaned_content['content_hash'], None)
+            if self.query_cache is not None:
+                self.query_cache.invalidate(orphaned_content['content_hash'])
+        return True
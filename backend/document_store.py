@@ -0,0 +1,404 @@
+import os
+import json
+import shutil
+import uuid
+import sqlite3
+import tempfile
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: whether an owner is still alive cannot be told
+    fcntl = None
+
+from paragraph_table import ParagraphTable
+
+CONTENT_FIELDS = [
+    'content_hash', 'document_title', 'file_size', 'total_paragraphs', 'total_pages', 'file_path'
+]
+DOCUMENT_FIELDS = ['document_id', 'content_hash', 'original_filename', 'document_title', 'upload_time']
+PARTIAL_FIELDS = DOCUMENT_FIELDS + [
+    'file_size', 'file_path', 'total_paragraphs', 'total_pages', 'pages_covered', 'generation', 'owner'
+]
+
+# Several API worker processes share one store; writers wait this long for each other's locks
+BUSY_TIMEOUT = 30.0
+
+class DocumentStore:
+    """Persistent document storage: metadata in SQLite, paragraphs and indexes as .npy files
+
+    Processed content is stored once per content hash; documents are lightweight
+    aliases pointing at it, and content is removed with its last document.
+
+    The store is safe to share between processes: SQLite runs in WAL mode so
+    readers never block on a writer, arrays are memory-mapped rather than
+    copied into each process, and deletions are logged so other processes
+    can drop what they have cached. The database is set up by the process
+    owning the store; others, such as ingestion workers, open it with
+    initialize=False once that is done.
+    """
+    def __init__(self, store_dir: str, initialize: bool = True):
+        self.store_dir = store_dir
+        self.db_path = os.path.join(store_dir, 'documents.db')
+        self.owner: Optional[str] = None  # Set by register_owner in the process running ingestion jobs
+        self._owner_lock = None
+        if initialize:
+            os.makedirs(store_dir, exist_ok=True)
+            self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation keeps the store safe to use from any thread
+        connection = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _init_db(self) -> None:
+        with self._connect() as connection:
+            # Persistent for the database file; lets every process read while one writes.
+            # Switching takes an exclusive lock, so it is only attempted while not yet in WAL mode.
+            if connection.execute('PRAGMA journal_mode').fetchone()[0] != 'wal':
+                connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS contents (
+                    content_hash TEXT PRIMARY KEY,
+                    document_title TEXT NOT NULL,
+                    file_size INTEGER NOT NULL DEFAULT 0,
+                    total_paragraphs INTEGER NOT NULL DEFAULT 0,
+                    total_pages INTEGER NOT NULL DEFAULT 0,
+                    file_path TEXT
+                )
+            ''')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS documents (
+                    document_id TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL REFERENCES contents (content_hash),
+                    original_filename TEXT NOT NULL,
+                    document_title TEXT NOT NULL,
+                    upload_time TEXT NOT NULL
+                )
+            ''')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS documents_content ON documents (content_hash)'
+            )
+            # Append-only log read by other processes to invalidate their caches
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS deletions (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    document_id TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    orphaned INTEGER NOT NULL
+                )
+            ''')
+            # Documents still being ingested; generation names the latest snapshot directory
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS partial_documents (
+                    document_id TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    original_filename TEXT NOT NULL,
+                    document_title TEXT NOT NULL,
+                    upload_time TEXT NOT NULL,
+                    file_size INTEGER NOT NULL DEFAULT 0,
+                    file_path TEXT,
+                    total_paragraphs INTEGER NOT NULL DEFAULT 0,
+                    total_pages INTEGER NOT NULL DEFAULT 0,
+                    pages_covered INTEGER NOT NULL DEFAULT 0,
+                    generation INTEGER NOT NULL DEFAULT 0,
+                    owner TEXT
+                )
+            ''')
+            add_missing_column(connection, 'partial_documents', 'owner', 'TEXT')
+
+    def _owners_dir(self) -> str:
+        return os.path.join(self.store_dir, 'owners')
+
+    def register_owner(self) -> str:
+        """Name this process as the owner of the rows it creates, for as long as it lives
+
+        The process holds a lock on a file named after its owner token until it
+        exits, however it exits, so live_owners can tell whether it is still
+        around. Returns the token.
+        """
+        owners_dir = self._owners_dir()
+        os.makedirs(owners_dir, exist_ok=True)
+        token = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # Locked before it gets its name, so live_owners never sees it unlocked
+        fd, tmp_path = tempfile.mkstemp(prefix='.owner-', dir=owners_dir)
+        lock_file = os.fdopen(fd, 'w')
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.rename(tmp_path, os.path.join(owners_dir, token))
+        self.owner, self._owner_lock = token, lock_file
+        return token
+
+    def live_owners(self) -> Optional[Set[str]]:
+        """Tokens of the registered owners still running, None where that cannot be told
+
+        Lock files of owners that are gone are removed on the way.
+        """
+        if fcntl is None:
+            return None
+        owners_dir = self._owners_dir()
+        live = set()
+        for token in os.listdir(owners_dir) if os.path.isdir(owners_dir) else []:
+            if token.startswith('.'):
+                continue
+            path = os.path.join(owners_dir, token)
+            try:
+                with open(path, 'a') as lock_file:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        live.add(token)
+                        continue
+                    os.remove(path)
+            except FileNotFoundError:
+                pass  # Removed by another process checking at the same time
+        return live
+
+    def discard_stale_partials(self, live_owners: Set[str]) -> List[str]:
+        """Delete the partial documents of owners no longer running, returning their IDs"""
+        with self._connect() as connection:
+            rows = connection.execute('SELECT document_id, owner FROM partial_documents').fetchall()
+        stale = [row['document_id'] for row in rows if row['owner'] not in live_owners]
+        for document_id in stale:
+            self.delete_partial(document_id)
+        return stale
+
+    def _content_dir(self, content_hash: str) -> str:
+        return os.path.join(self.store_dir, content_hash)
+
+    def _partial_dir(self, document_id: str) -> str:
+        return os.path.join(self.store_dir, 'partial', document_id)
+
+    def save_content(self, content: Dict[str, Any], paragraphs: ParagraphTable,
+                     index_data: Optional[Dict[str, Any]] = None) -> bool:
+        """Write paragraph columns and index arrays, then register the content
+
+        Concurrent writers of the same content may all get here. Only the first
+        one's files are published and only one of them claims the row; the
+        others return False and leave indexing the content to the claimant.
+        """
+        _write_arrays(self._content_dir(content['content_hash']), paragraphs, index_data, replace=False)
+
+        with self._connect() as connection:
+            cursor = connection.execute(
+                f"INSERT OR IGNORE INTO contents ({', '.join(CONTENT_FIELDS)}) "
+                f"VALUES ({', '.join('?' for _ in CONTENT_FIELDS)})",
+                [content.get(field) for field in CONTENT_FIELDS]
+            )
+        return cursor.rowcount == 1
+
+    def get_content(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Fetch a stored content row"""
+        with self._connect() as connection:
+            row = connection.execute(
+                'SELECT * FROM contents WHERE content_hash = ?', (content_hash,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def list_content_hashes(self) -> List[str]:
+        with self._connect() as connection:
+            return [row[0] for row in connection.execute('SELECT content_hash FROM contents')]
+
+    def add_document(self, metadata: Dict[str, Any]) -> None:
+        """Register a document alias for already stored content"""
+        with self._connect() as connection:
+            connection.execute(
+                f"INSERT INTO documents ({', '.join(DOCUMENT_FIELDS)}) "
+                f"VALUES ({', '.join('?' for _ in DOCUMENT_FIELDS)})",
+                [metadata.get(field) for field in DOCUMENT_FIELDS]
+            )
+
+    def get_metadata(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch a single document joined with its content"""
+        with self._connect() as connection:
+            row = connection.execute(
+                f"{_DOCUMENT_QUERY} WHERE d.document_id = ?", (document_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def list_metadata(self) -> List[Dict[str, Any]]:
+        """Fetch all documents in upload order"""
+        with self._connect() as connection:
+            rows = connection.execute(f"{_DOCUMENT_QUERY} ORDER BY d.upload_time").fetchall()
+        return [dict(row) for row in rows]
+
+    def documents_for_contents(self, content_hashes: List[str]) -> Dict[str, List[str]]:
+        """Map each content hash to its document IDs, oldest first"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT content_hash, document_id FROM documents "
+                f"WHERE content_hash IN ({', '.join('?' for _ in content_hashes)}) ORDER BY upload_time",
+                content_hashes
+            ).fetchall()
+        documents: Dict[str, List[str]] = {}
+        for content_hash, document_id in rows:
+            documents.setdefault(content_hash, []).append(document_id)
+        return documents
+
+    def load_content(self, content_hash: str) -> Dict[str, Any]:
+        """Memory-map the paragraph table and index arrays of stored content"""
+        return _read_arrays(self._content_dir(content_hash))
+
+    def save_partial(self, metadata: Dict[str, Any], paragraphs: ParagraphTable,
+                     index_data: Optional[Dict[str, Any]] = None) -> None:
+        """Publish a snapshot of a document that is still being ingested
+
+        Each snapshot gets its own directory, named by metadata['generation'],
+        so processes still reading the previous one are not disturbed.
+        """
+        document_dir = self._partial_dir(metadata['document_id'])
+        _write_arrays(os.path.join(document_dir, str(metadata['generation'])), paragraphs, index_data)
+
+        with self._connect() as connection:
+            connection.execute(
+                f"INSERT OR REPLACE INTO partial_documents ({', '.join(PARTIAL_FIELDS)}) "
+                f"VALUES ({', '.join('?' for _ in PARTIAL_FIELDS)})",
+                [metadata.get(field) for field in PARTIAL_FIELDS]
+            )
+
+        # Memory-mapped files stay readable after removal where the OS allows it
+        for name in os.listdir(document_dir):
+            if name != str(metadata['generation']):
+                shutil.rmtree(os.path.join(document_dir, name), ignore_errors=True)
+
+    def get_partial(self, document_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as connection:
+            row = connection.execute(
+                'SELECT * FROM partial_documents WHERE document_id = ?', (document_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def load_partial(self, document_id: str, generation: int) -> Dict[str, Any]:
+        """Memory-map one snapshot of a partially ingested document"""
+        return _read_arrays(os.path.join(self._partial_dir(document_id), str(generation)))
+
+    def delete_partial(self, document_id: str) -> None:
+        with self._connect() as connection:
+            connection.execute('DELETE FROM partial_documents WHERE document_id = ?', (document_id,))
+        shutil.rmtree(self._partial_dir(document_id), ignore_errors=True)
+
+    def last_deletion(self) -> int:
+        """Sequence number of the latest deletion, 0 if there was none"""
+        with self._connect() as connection:
+            return connection.execute('SELECT COALESCE(MAX(seq), 0) FROM deletions').fetchone()[0]
+
+    def deletions_since(self, seq: int) -> List[Tuple[int, str, str, bool]]:
+        """(seq, document_id, content_hash, orphaned) of deletions after seq, oldest first"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                'SELECT seq, document_id, content_hash, orphaned FROM deletions WHERE seq > ? ORDER BY seq',
+                (seq,)
+            ).fetchall()
+        return [(row[0], row[1], row[2], bool(row[3])) for row in rows]
+
+    def delete(self, document_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Remove a document alias
+
+        Returns whether the document existed and, if it was the last reference
+        to its content, the removed content row so callers can clean up after it.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                'SELECT content_hash FROM documents WHERE document_id = ?', (document_id,)
+            ).fetchone()
+            if row is None:
+                return False, None
+
+            content_hash = row['content_hash']
+            connection.execute('DELETE FROM documents WHERE document_id = ?', (document_id,))
+            references = connection.execute(
+                'SELECT COUNT(*) FROM documents WHERE content_hash = ?', (content_hash,)
+            ).fetchone()[0]
+            connection.execute(
+                'INSERT INTO deletions (document_id, content_hash, orphaned) VALUES (?, ?, ?)',
+                (document_id, content_hash, int(references == 0))
+            )
+            if references > 0:
+                return True, None
+
+            content = connection.execute(
+                'SELECT * FROM contents WHERE content_hash = ?', (content_hash,)
+            ).fetchone()
+            connection.execute('DELETE FROM contents WHERE content_hash = ?', (content_hash,))
+
+        shutil.rmtree(self._content_dir(content_hash), ignore_errors=True)
+        return True, dict(content) if content else None
+
+def add_missing_column(connection: sqlite3.Connection, table: str, column: str, definition: str) -> None:
+    """Add a column to a table created before the column existed"""
+    columns = {row[1] for row in connection.execute(f'PRAGMA table_info({table})')}
+    if column not in columns:
+        connection.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+_DOCUMENT_QUERY = (
+    "SELECT d.document_id, d.content_hash, d.original_filename, d.document_title, d.upload_time, "
+    "c.file_size, c.total_paragraphs, c.total_pages, c.file_path "
+    "FROM documents d JOIN contents c ON c.content_hash = d.content_hash"
+)
+
+def _write_arrays(final_dir: str,
+                  paragraphs: ParagraphTable,
+                  index_data: Optional[Dict[str, Any]],
+                  replace: bool = True) -> None:
+    """Write paragraph columns and index arrays into final_dir atomically
+
+    With replace=False an existing final_dir wins and this write is dropped.
+    """
+    # A temporary directory of its own, so concurrent writers of one final_dir never collide
+    parent, name = os.path.split(final_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f"{name}.tmp-", dir=parent)
+
+    paragraphs_dir = os.path.join(tmp_dir, 'paragraphs')
+    os.makedirs(paragraphs_dir)
+    for name, array in paragraphs.to_arrays().items():
+        np.save(os.path.join(paragraphs_dir, f"{name}.npy"), array)
+
+    if index_data is not None:
+        index_dir = os.path.join(tmp_dir, 'index')
+        os.makedirs(index_dir)
+        with open(os.path.join(index_dir, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+            json.dump(index_data['vocabulary'], f)
+        for name, array in index_data['arrays'].items():
+            np.save(os.path.join(index_dir, f"{name}.npy"), array)
+
+    # Files become visible only once complete, so readers never see a partial document
+    if replace:
+        shutil.rmtree(final_dir, ignore_errors=True)
+    try:
+        os.rename(tmp_dir, final_dir)
+    except OSError:
+        if replace or not os.path.isdir(final_dir):
+            raise
+        shutil.rmtree(tmp_dir, ignore_errors=True)  # Another writer published first
+
+def _read_arrays(directory: str) -> Dict[str, Any]:
+    """Memory-map the paragraph table and, if present, the index arrays written by _write_arrays"""
+    index_data = None
+    index_dir = os.path.join(directory, 'index')
+    if os.path.isdir(index_dir):
+        with open(os.path.join(index_dir, 'vocabulary.json'), 'r', encoding='utf-8') as f:
+            vocabulary = json.load(f)
+        index_data = {'vocabulary': vocabulary, 'arrays': _load_arrays(index_dir)}
+
+    return {
+        'paragraphs': ParagraphTable.from_arrays(_load_arrays(os.path.join(directory, 'paragraphs'))),
+        'index_data': index_data
+    }
+
+def _load_arrays(directory: str) -> Dict[str, np.ndarray]:
+    return {
+        name[:-len('.npy')]: _load_array(os.path.join(directory, name))
+        for name in os.listdir(directory) if name.endswith('.npy')
+    }
+
+def _load_array(path: str) -> np.ndarray:
+    """Memory-map a .npy file, falling back to a regular read for empty arrays"""
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        # Zero-length arrays cannot be memory-mapped
+        return np.load(path)
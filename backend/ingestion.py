@@ -0,0 +1,92 @@
+import os
+from typing import Dict, Any, Optional
+
+import config
+from document_manager import DocumentManager
+from text_processor import TextProcessor
+from similarity_search import SimilaritySearch
+from corpus_index import stop_words
+from instrumentation import metrics
+
+# Components are created once per worker process and reused across jobs
+_components: Dict[str, Any] = {}
+
+def _get_components(upload_dir: str) -> Dict[str, Any]:
+    if _components.get('upload_dir') != upload_dir:
+        _components.update({
+            'upload_dir': upload_dir,
+            # The API process set up the store before starting the pool
+            'document_manager': DocumentManager(upload_dir, initialize=False),
+            'text_processor': TextProcessor(),
+            'similarity_search': SimilaritySearch(lsa_dimensions=config.LSA_DIMENSIONS)
+        })
+    return _components
+
+def lower_priority(increment: int) -> None:
+    """Pool initializer: run extraction below the API process, so questions win the CPU"""
+    if increment and hasattr(os, 'nice'):
+        os.nice(increment)
+
+def warm_up(upload_dir: str) -> int:
+    """Load every extraction and indexing library in this worker ahead of its first job"""
+    components = _get_components(upload_dir)
+    components['text_processor'].warm_up()
+    components['similarity_search'].warm_up()
+    stop_words()
+    return os.getpid()
+
+def ingest_document(upload_dir: str,
+                    document_id: str,
+                    content_hash: str,
+                    file_path: str,
+                    mime_type: str,
+                    original_filename: str,
+                    extracted_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Extract, index and store a saved upload; runs inside an ingestion worker process
+    
+    Stage timings recorded in the worker are returned under 'timings' for the
+    API process to record, since each process has its own metrics.
+    """
+    with metrics.collect() as timings:
+        result = _ingest(upload_dir, document_id, content_hash, file_path, mime_type,
+                         original_filename, extracted_data)
+    result['timings'] = timings
+    return result
+
+def _ingest(upload_dir: str,
+            document_id: str,
+            content_hash: str,
+            file_path: str,
+            mime_type: str,
+            original_filename: str,
+            extracted_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    components = _get_components(upload_dir)
+    text_processor = components['text_processor']
+    
+    # Extract text and metadata, unless the caller already did it page range by page range
+    if extracted_data is None:
+        with metrics.stage('ingest.extract'):
+            extracted_data = text_processor.extract_text_with_metadata(file_path, mime_type)
+    extracted_data['file_size'] = os.path.getsize(file_path)
+    
+    # Generate document title from first sentence
+    first_sentence = text_processor.get_first_sentence(extracted_data['full_text'])
+    
+    # Build the search index once so questions only vectorize the query
+    with metrics.stage('ingest.index'):
+        search_index = components['similarity_search'].build_index(extracted_data['paragraphs'])
+    
+    # Store document metadata; the API process picks the document up from the store
+    with metrics.stage('ingest.store'):
+        components['document_manager'].store_document_metadata(
+            document_id, original_filename, extracted_data, first_sentence, search_index,
+            content_hash, file_path
+        )
+    
+    return {
+        'document_id': document_id,
+        'document_title': first_sentence,
+        'original_filename': original_filename,
+        'total_paragraphs': len(extracted_data['paragraphs']),
+        'total_pages': extracted_data['total_pages']
+    }
@@ -0,0 +1,169 @@
+import time
+import threading
+import importlib
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple, Callable, ContextManager, Iterator
+
+import config
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond scoring to long PDF extractions
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (stage, seconds) pairs recorded while handling the current request, for Server-Timing
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('request_timings', default=None)
+
+_DISABLED = nullcontext()
+
+class Histogram:
+    """Count and total of observed durations plus per-bucket counts"""
+    __slots__ = ('buckets', 'count', 'total')
+    
+    def __init__(self):
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+    
+    def observe(self, seconds: float) -> None:
+        self.buckets[bisect_left(DURATION_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+class StageMetrics:
+    """Per-stage duration histograms for the ingestion and question hot paths
+    
+    Stages are timed with `with metrics.stage('name'):`. When disabled, stage()
+    returns a shared no-op context manager, so instrumented code pays one call.
+    Durations also go to the current request's Server-Timing list, and stages
+    timed in worker processes can be collected there and recorded here.
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stages: Dict[str, Histogram] = {}
+        self.requests: Dict[Tuple[str, str, str], Histogram] = {}
+        self.profiler_hook: Optional[Callable[[str], Optional[ContextManager]]] = None
+        self._lock = threading.Lock()
+    
+    def stage(self, name: str) -> ContextManager:
+        """Time a block of code as the named stage"""
+        if not self.enabled:
+            return _DISABLED
+        return self._timed(name)
+    
+    @contextmanager
+    def _timed(self, name: str) -> Iterator[None]:
+        # The profiler hook may wrap the stage, e.g. to start a sampling profiler or tag its samples
+        profile = self.profiler_hook(name) if self.profiler_hook else None
+        start = time.perf_counter()
+        try:
+            if profile is None:
+                yield
+            else:
+                with profile:
+                    yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+    
+    def record(self, name: str, seconds: float) -> None:
+        """Add one observation of a stage"""
+        with self._lock:
+            histogram = self.stages.get(name)
+            if histogram is None:
+                histogram = self.stages[name] = Histogram()
+            histogram.observe(seconds)
+        
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, seconds))
+    
+    def record_all(self, timings: List[Tuple[str, float]]) -> None:
+        """Record stages timed elsewhere, typically returned by a worker process"""
+        if not self.enabled:
+            return
+        for name, seconds in timings:
+            self.record(name, seconds)
+    
+    def record_request(self, method: str, route: str, status: int, seconds: float) -> None:
+        if not self.enabled:
+            return
+        key = (method, route, str(status))
+        with self._lock:
+            histogram = self.requests.get(key)
+            if histogram is None:
+                histogram = self.requests[key] = Histogram()
+            histogram.observe(seconds)
+    
+    @contextmanager
+    def collect(self) -> Iterator[List[Tuple[str, float]]]:
+        """Gather the stages timed inside the block into a list, e.g. to send back from a worker"""
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        try:
+            yield timings
+        finally:
+            _request_timings.reset(token)
+    
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+            self.requests.clear()
+    
+    def render_prometheus(self) -> str:
+        """All histograms in the Prometheus text exposition format"""
+        with self._lock:
+            stages = sorted(self.stages.items())
+            requests = sorted(self.requests.items())
+        
+        lines = [
+            '# HELP askyourdoc_stage_duration_seconds Time spent in each processing stage.',
+            '# TYPE askyourdoc_stage_duration_seconds histogram'
+        ]
+        for name, histogram in stages:
+            lines.extend(_histogram_lines('askyourdoc_stage_duration_seconds', {'stage': name}, histogram))
+        
+        lines.extend([
+            '# HELP askyourdoc_request_duration_seconds HTTP request handling time.',
+            '# TYPE askyourdoc_request_duration_seconds histogram'
+        ])
+        for (method, route, status), histogram in requests:
+            lines.extend(_histogram_lines(
+                'askyourdoc_request_duration_seconds',
+                {'method': method, 'route': route, 'status': status},
+                histogram
+            ))
+        return '\n'.join(lines) + '\n'
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """Format request stages as a Server-Timing header, summing repeated stages"""
+    totals: Dict[str, float] = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ', '.join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in totals.items())
+
+def load_profiler_hook(path: str) -> Callable[[str], Optional[ContextManager]]:
+    """Import a profiler hook given as 'module:function'"""
+    module_name, _, attribute = path.partition(':')
+    if not attribute:
+        raise ValueError(f"Profiler hook must look like 'module:function', got {path!r}")
+    return getattr(importlib.import_module(module_name), attribute)
+
+def _histogram_lines(metric: str, labels: Dict[str, str], histogram: Histogram) -> List[str]:
+    label_text = ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels.items())
+    lines = []
+    cumulative = 0
+    for bound, count in zip(DURATION_BUCKETS + (float('inf'),), histogram.buckets):
+        cumulative += count
+        le = '+Inf' if bound == float('inf') else repr(bound)
+        lines.append(f'{metric}_bucket{{{label_text},le="{le}"}} {cumulative}')
+    lines.append(f'{metric}_sum{{{label_text}}} {histogram.total}')
+    lines.append(f'{metric}_count{{{label_text}}} {histogram.count}')
+    return lines
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Shared by every module of the process; worker processes get their own copy
+metrics = StageMetrics(config.METRICS_ENABLED)
+if config.PROFILER_HOOK:
+    metrics.profiler_hook = load_profiler_hook(config.PROFILER_HOOK)
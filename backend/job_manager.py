@@ -0,0 +1,136 @@
+import json
+import uuid
+import sqlite3
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set
+
+from document_store import BUSY_TIMEOUT, add_missing_column
+
+JOB_FIELDS = [
+    'job_id', 'document_id', 'original_filename', 'status', 'created_time', 'finished_time',
+    'result', 'error', 'pages_covered', 'total_pages', 'owner'
+]
+
+class JobManager:
+    """Ingestion job status, kept in SQLite so every API worker process sees every job
+
+    Jobs are tagged with the owner token of the process running them (see
+    DocumentStore.register_owner), so jobs left behind by a process that
+    died can be told apart from those still running elsewhere.
+    """
+    def __init__(self, db_path: str, owner: Optional[str] = None):
+        self.db_path = db_path
+        self.owner = owner
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _init_db(self) -> None:
+        with self._connect() as connection:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    document_id TEXT NOT NULL,
+                    original_filename TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_time TEXT NOT NULL,
+                    finished_time TEXT,
+                    result TEXT,
+                    error TEXT,
+                    pages_covered INTEGER,
+                    total_pages INTEGER,
+                    owner TEXT
+                )
+            ''')
+            add_missing_column(connection, 'jobs', 'owner', 'TEXT')
+
+    def create_job(self, document_id: str, original_filename: str) -> Dict[str, Any]:
+        """Register a queued ingestion job"""
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'document_id': document_id,
+            'original_filename': original_filename,
+            'status': 'queued',
+            'created_time': datetime.now().isoformat(),
+            'finished_time': None,
+            'result': None,
+            'error': None,
+            'pages_covered': None,  # Set for documents that become queryable page range by page range
+            'total_pages': None,
+            'owner': self.owner
+        }
+        with self._connect() as connection:
+            connection.execute(
+                f"INSERT INTO jobs ({', '.join(JOB_FIELDS)}) VALUES ({', '.join('?' for _ in JOB_FIELDS)})",
+                [job[field] for field in JOB_FIELDS]
+            )
+        return job
+
+    def mark_processing(self, job_id: str) -> None:
+        self._update(job_id, status='processing')
+
+    def update_progress(self, job_id: str, pages_covered: int, total_pages: int) -> None:
+        self._update(job_id, pages_covered=pages_covered, total_pages=total_pages)
+
+    def mark_completed(self, job_id: str, result: Dict[str, Any]) -> None:
+        self._update(
+            job_id,
+            status='completed',
+            finished_time=datetime.now().isoformat(),
+            result=json.dumps(result)
+        )
+
+    def mark_failed(self, job_id: str, error: str) -> None:
+        self._update(
+            job_id,
+            status='failed',
+            finished_time=datetime.now().isoformat(),
+            error=error
+        )
+
+    def fail_stale_jobs(self, live_owners: Set[str]) -> List[str]:
+        """Mark unfinished jobs of owners no longer running as failed, returning their IDs"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT job_id, owner FROM jobs WHERE status IN ('queued', 'processing')"
+            ).fetchall()
+        stale = [row['job_id'] for row in rows if row['owner'] not in live_owners]
+        for job_id in stale:
+            self.mark_failed(job_id, "Interrupted: the server process running this job stopped")
+        return stale
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retrieve job status by ID"""
+        with self._connect() as connection:
+            row = connection.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def get_active_job(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Latest queued or processing job of a document, if any"""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE document_id = ? AND status IN ('queued', 'processing') "
+                "ORDER BY created_time DESC LIMIT 1",
+                (document_id,)
+            ).fetchone()
+        return _job(row) if row else None
+
+    def get_all_jobs(self) -> List[Dict[str, Any]]:
+        with self._connect() as connection:
+            rows = connection.execute('SELECT * FROM jobs ORDER BY created_time').fetchall()
+        return [_job(row) for row in rows]
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                f"UPDATE jobs SET {', '.join(f'{field} = ?' for field in fields)} WHERE job_id = ?",
+                [*fields.values(), job_id]
+            )
+
+def _job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
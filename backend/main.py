@@ -1,17 +1,96 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Union, Literal
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+from bisect import bisect_left
 import os
+import time
 
-from document_manager import DocumentManager
-from text_processor import TextProcessor
+import config
+from document_manager import DocumentManager, UploadTooLargeError, EmptyUploadError
+from text_processor import TextProcessor, extract_pdf_pages_timed
 from similarity_search import SimilaritySearch
+from job_manager import JobManager
+from query_cache import QueryCache
+from ingestion import ingest_document, lower_priority, warm_up as warm_up_worker
+from corpus_index import stop_words
+from instrumentation import metrics, server_timing_header
+from admission import Lane, Ticket, Overloaded, render_prometheus as render_lane_metrics
 
 # Initialize components
 app = FastAPI(title="AskYourDoc Backend", version="1.0.0")
 
+# Extraction and indexing run here so they never block the event loop. Workers start on
+# demand; forking them from this process while a thread is inside SQLite would hand them
+# its lock state, so they come from a fork server instead
+ingestion_executor = ProcessPoolExecutor(
+    max_workers=config.INGESTION_WORKERS, mp_context=multiprocessing.get_context('forkserver'),
+    initializer=lower_priority, initargs=(config.INGESTION_NICE,)
+)
+# Questions are scored on their own threads, so a slow one never holds up the event loop
+query_executor = ThreadPoolExecutor(config.QUERY_CONCURRENCY, thread_name_prefix='query')
+
+# Admission control: ingestion jobs only start while no question is waiting for a slot
+query_lane = Lane('query', config.QUERY_CONCURRENCY, config.QUERY_QUEUE_SIZE, config.QUERY_QUEUE_TIMEOUT)
+ingestion_lane = Lane(
+    'ingestion', config.INGESTION_CONCURRENCY, config.INGESTION_QUEUE_SIZE, yields_to=query_lane
+)
+
+query_cache = QueryCache(config.QUERY_CACHE_SIZE, config.QUERY_CACHE_TTL)
+# Sets up the store's database; the pool's workers start on the first job and only open it
+document_manager = DocumentManager(config.UPLOAD_DIR, query_cache=query_cache)
+text_processor = TextProcessor(ingestion_executor, config.PDF_PAGES_PER_CHUNK)
+similarity_search = SimilaritySearch(
+    config.DEFAULT_SCORER, config.LSA_DIMENSIONS, config.IVF_PROBES, config.HYBRID_WEIGHT
+)
+# Jobs and partial documents of this process are tagged with its owner token, so that
+# whatever it leaves behind when it dies can be cleaned up by the next process to start
+owner = document_manager.store.register_owner()
+job_manager = JobManager(document_manager.store.db_path, owner)  # Shared with every API worker process
+
+# Allowance for the multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+@app.middleware("http")
+async def guard_uploads(request: Request, call_next):
+    """Turn uploads away before their body is read: oversized by Content-Length, or with the ingestion queue full"""
+    if request.method == 'POST' and request.url.path == '/upload':
+        content_length = request.headers.get('content-length', '')
+        if content_length.isdigit() and int(content_length) > config.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD:
+            return JSONResponse(
+                {'detail': f"File exceeds the maximum size of {config.MAX_UPLOAD_SIZE} bytes"}, 413
+            )
+        try:
+            ingestion_lane.check()
+        except Overloaded as e:
+            return JSONResponse({'detail': e.detail}, e.status_code, headers=e.headers)
+    return await call_next(request)
+
+@app.middleware("http")
+async def record_request_timings(request: Request, call_next):
+    """Time each request and report its stages in a Server-Timing header"""
+    if not metrics.enabled:
+        return await call_next(request)
+    
+    start = time.perf_counter()
+    with metrics.collect() as timings:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    
+    # Route templates keep document IDs out of the metric labels
+    route = request.scope.get('route')
+    metrics.record_request(request.method, route.path if route else 'unmatched', response.status_code, elapsed)
+    response.headers['Server-Timing'] = server_timing_header(timings + [('total', elapsed)])
+    return response
+
+# Added after every @app.middleware so it is the outermost layer: responses those middlewares
+# return early, such as 429 and 413, still carry the CORS headers browsers need to read them
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
@@ -20,16 +99,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-document_manager = DocumentManager()
-text_processor = TextProcessor()
-similarity_search = SimilaritySearch()
-
 # Pydantic models
 class QuestionRequest(BaseModel):
-    question: str
+    question: str  # May contain "exact phrases" and `a NEAR/k b` clauses that results must match
     document_id: str
-    top_k: int = 5  # Number of relevant paragraphs to return
-    context_paragraphs: int = 5  # Context in each direction
+    top_k: int = Field(5, ge=0)  # Number of relevant paragraphs to return
+    context_paragraphs: int = Field(5, ge=0)  # Context in each direction
+    scorer: Optional[str] = None  # Ranking method, defaults to the deployment setting
+    response_format: Literal['full', 'compact'] = 'full'  # compact: shared paragraph table, no copies
 
 class ParagraphResponse(BaseModel):
     text: str
@@ -46,12 +123,41 @@ class SearchResult(BaseModel):
     context_before: List[ParagraphResponse]
     context_after: List[ParagraphResponse]
 
+class CorpusSearchRequest(BaseModel):
+    question: str
+    document_ids: Optional[List[str]] = None  # Restrict the search to these documents
+    top_k: int = Field(5, ge=0)
+    context_paragraphs: int = Field(5, ge=0)
+
+class CorpusSearchResult(SearchResult):
+    document_id: str
+
+class CorpusSearchResponse(BaseModel):
+    results: List[CorpusSearchResult]
+    total_paragraphs_searched: int
+
 class QuestionResponse(BaseModel):
     document_id: str
     document_title: str
     original_filename: str
     results: List[SearchResult]
     total_paragraphs_searched: int
+    # Set while the document is still being ingested: results cover only the first pages_covered pages
+    pages_covered: Optional[int] = None
+    total_pages: Optional[int] = None
+
+class BatchQuestionRequest(BaseModel):
+    questions: List[str]
+    document_ids: List[str]  # Every question is asked against every document
+    top_k: int = Field(5, ge=0)
+    context_paragraphs: int = Field(5, ge=0)
+    scorer: Optional[str] = None
+
+class BatchAnswer(QuestionResponse):
+    question: str
+
+class BatchQuestionResponse(BaseModel):
+    answers: List[BatchAnswer]
 
 class UploadResponse(BaseModel):
     document_id: str
@@ -61,94 +167,352 @@ class UploadResponse(BaseModel):
     total_pages: int
     message: str
 
+class JobResponse(BaseModel):
+    job_id: str
+    document_id: str
+    original_filename: str
+    status: str
+    created_time: str
+    finished_time: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    pages_covered: Optional[int] = None  # Progress of documents that are queryable while ingesting
+    total_pages: Optional[int] = None
+
+def format_search_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a similarity search result for SearchResult"""
+    return {
+        'paragraph': {
+            'text': result['paragraph']['text'],
+            'page': result['paragraph']['page'],
+            'paragraph_index': result['paragraph']['paragraph_index'],
+            'similarity_score': result['similarity_score']
+        },
+        'context_before': [
+            {
+                'text': p['text'],
+                'page': p['page'],
+                'paragraph_index': p['paragraph_index'],
+                'similarity_score': 0.0  # Context paragraphs don't have similarity scores
+            }
+            for p in result['context_before']
+        ],
+        'context_after': [
+            {
+                'text': p['text'],
+                'page': p['page'],
+                'paragraph_index': p['paragraph_index'],
+                'similarity_score': 0.0
+            }
+            for p in result['context_after']
+        ]
+    }
+
+def ingestion_progress(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Coverage fields for answers from a document that is still being ingested"""
+    if 'pages_covered' not in document:
+        return {}
+    return {'pages_covered': document['pages_covered'], 'total_pages': document['total_pages']}
+
+def document_not_found(document_id: str) -> HTTPException:
+    """404 for an unknown document, or 409 naming its job while it is still queued for ingestion"""
+    job = job_manager.get_active_job(document_id)
+    if job is None:
+        return HTTPException(404, f"Document not found: {document_id}")
+    return HTTPException(
+        409, f"Document {document_id} is still being ingested by job {job['job_id']}",
+        headers={'Retry-After': '1'}
+    )
+
+def validate_scorer(scorer: Optional[str]) -> None:
+    if scorer is not None and scorer not in similarity_search.scorers:
+        raise HTTPException(
+            400, f"Unknown scorer: {scorer}. Available: {', '.join(similarity_search.scorers)}"
+        )
+
+def compact_search_results(results: List[Dict[str, Any]],
+                           paragraphs: List[Dict[str, Any]],
+                           context_paragraphs: int) -> Dict[str, Any]:
+    """Shape results as one de-duplicated paragraph table plus row ranges into it
+    
+    Each result holds the table row of its hit and [start, end) row ranges for
+    its context, so overlapping context is serialized once.
+    """
+    spans = []
+    positions = set()
+    for result in results:
+        position = result['position']
+        before = (max(0, position - context_paragraphs), position)
+        after = (position + 1, min(len(paragraphs), position + context_paragraphs + 1))
+        spans.append((position, before, after))
+        positions.add(position)
+        positions.update(range(before[0], after[1]))
+    
+    # Table rows follow document order, so every context span maps to a contiguous row range
+    table = sorted(positions)
+    
+    def rows(start: int, end: int) -> List[int]:
+        return [bisect_left(table, start), bisect_left(table, end)]
+    
+    return {
+        'paragraphs': [
+            {
+                'text': paragraphs[position]['text'],
+                'page': paragraphs[position]['page'],
+                'paragraph_index': paragraphs[position]['paragraph_index']
+            }
+            for position in table
+        ],
+        'results': [
+            {
+                'paragraph': bisect_left(table, position),
+                'similarity_score': result['similarity_score'],
+                'context_before': rows(*before),
+                'context_after': rows(*after)
+            }
+            for result, (position, before, after) in zip(results, spans)
+        ]
+    }
+
 # API endpoints
 @app.get("/")
 async def root():
     return {"message": "AskYourDoc Backend", "status": "running"}
 
-@app.post("/upload", response_model=UploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+@app.post("/upload", response_model=Union[UploadResponse, JobResponse])
+async def upload_document(file: UploadFile = File(...),
+                          wait: bool = Query(False, description="Process synchronously and return the document")):
+    # Claimed up front, so the queue bound also covers uploads still being written to disk
+    ticket = ingestion_lane.reserve()
+    task = None
     try:
         # Validate file type
         if file.content_type not in text_processor.supported_formats:
             raise HTTPException(400, f"Unsupported file type: {file.content_type}")
         
-        # Read file
-        file_content = await file.read()
-        if len(file_content) == 0:
-            raise HTTPException(400, "File is empty")
-        
-        # Save document
-        document_id, file_path = document_manager.save_document(file_content, file.filename)
+        # The form is parsed in full before this handler runs, so chunked bodies without a
+        # Content-Length are only caught here, before the spooled file is copied
+        if file.size is not None and file.size > config.MAX_UPLOAD_SIZE:
+            raise HTTPException(413, f"File exceeds the maximum size of {config.MAX_UPLOAD_SIZE} bytes")
         
-        # Extract text and metadata
-        extracted_data = text_processor.extract_text_with_metadata(file_path, file.content_type)
+        # Stream the file to disk, hashing it chunk by chunk
+        try:
+            content_hash, file_path, _ = await document_manager.save_document_stream(
+                file, file.filename, config.MAX_UPLOAD_SIZE, config.UPLOAD_CHUNK_SIZE
+            )
+        except UploadTooLargeError as e:
+            raise HTTPException(413, str(e))
+        except EmptyUploadError as e:
+            raise HTTPException(400, str(e))
         
-        # Generate document title from first sentence
-        first_sentence = text_processor.get_first_sentence(extracted_data['full_text'])
+        # SQLite calls run in threads: a write can wait seconds for the lock held by another process
+        document_id = document_manager.generate_document_id(content_hash, file.filename)
+        job = await asyncio.to_thread(job_manager.create_job, document_id, file.filename)
         
-        # Store document metadata
-        document_manager.store_document_metadata(
-            document_id, file.filename, extracted_data, first_sentence
+        # Identical bytes were processed before: only a new document alias is needed
+        result = await asyncio.to_thread(
+            document_manager.add_duplicate_document, document_id, content_hash, file.filename
         )
+        if result is not None:
+            await asyncio.to_thread(job_manager.mark_completed, job['job_id'], result)
+        else:
+            task = asyncio.create_task(run_ingestion_job(
+                ticket, job['job_id'], document_id, content_hash, file_path, file.content_type, file.filename
+            ))
+        
+        if not wait:
+            return JobResponse(**await asyncio.to_thread(job_manager.get_job, job['job_id']))
+        
+        if result is None:
+            result = await task
+        if result is None:
+            raise RuntimeError((await asyncio.to_thread(job_manager.get_job, job['job_id']))['error'])
         
         return UploadResponse(
-            document_id=document_id,
-            document_title=first_sentence,
-            original_filename=file.filename,
-            total_paragraphs=len(extracted_data['paragraphs']),
-            total_pages=extracted_data['total_pages'],
+            **result,
             message="Document uploaded and processed successfully"
         )
-        
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"Error processing document: {str(e)}")
+    finally:
+        # Rejected and duplicate uploads never start a job
+        if task is None:
+            ingestion_lane.release(ticket)
+
+async def run_ingestion_job(ticket: Ticket,
+                            job_id: str,
+                            document_id: str,
+                            content_hash: str,
+                            file_path: str,
+                            mime_type: str,
+                            original_filename: str) -> Optional[Dict[str, Any]]:
+    """Run one ingestion job in the process pool once the ingestion lane admits it, and record its outcome"""
+    await ingestion_lane.wait(ticket)
+    loop = asyncio.get_running_loop()
+    try:
+        await asyncio.to_thread(job_manager.mark_processing, job_id)
+        extracted_data = None
+        if mime_type == 'application/pdf':
+            # Large PDFs fan out over the pool in page ranges and become queryable as they go;
+            # small ones go to a single worker
+            page_count = await asyncio.to_thread(text_processor.count_pdf_pages, file_path)
+            if page_count > text_processor.pages_per_chunk:
+                extracted_data = await extract_progressively(
+                    job_id, document_id, content_hash, file_path, original_filename, page_count
+                )
+        
+        result = await loop.run_in_executor(
+            ingestion_executor, ingest_document,
+            document_manager.upload_dir, document_id, content_hash, file_path, mime_type,
+            original_filename, extracted_data
+        )
+        metrics.record_all(result.pop('timings'))
+    except Exception as e:
+        await asyncio.to_thread(job_manager.mark_failed, job_id, str(e))
+        return None
+    finally:
+        try:
+            # The stored document takes over from the partial one
+            await asyncio.to_thread(document_manager.finish_partial_document, document_id)
+        finally:
+            ingestion_lane.release(ticket)
+    
+    await asyncio.to_thread(job_manager.mark_completed, job_id, result)
+    return result
+
+async def extract_progressively(job_id: str,
+                                document_id: str,
+                                content_hash: str,
+                                file_path: str,
+                                original_filename: str,
+                                page_count: int) -> Dict[str, Any]:
+    """Extract a large PDF range by range, answering questions on the pages covered so far
+    
+    Every page range is queued on the pool at once and taken back in page
+    order. Each one is segmented and added to an incremental index before the
+    next is awaited. Snapshots rebuild the whole index, so the partial
+    document is only republished after ranges 1, 2, 4, 8, ... and the last
+    one, which keeps the total snapshot cost linear in the page count.
+    """
+    loop = asyncio.get_running_loop()
+    chunks = [
+        loop.run_in_executor(ingestion_executor, extract_pdf_pages_timed, file_path, start, end)
+        for start, end in text_processor.pdf_page_ranges(page_count)
+    ]
+    merger = text_processor.pdf_merger()
+    index = similarity_search.incremental_index()
+    
+    def add_pages(pages, publish):
+        paragraphs = merger.add_pages(pages)
+        index.add([p['text'] for p in paragraphs])
+        if publish:
+            title = text_processor.get_first_sentence(merger.page_texts[0]) if merger.page_texts else None
+            document_manager.update_partial_document(
+                document_id, list(merger.paragraphs), index.snapshot(), merger.pages_covered, title
+            )
+        job_manager.update_progress(job_id, merger.pages_covered, page_count)
+    
+    await asyncio.to_thread(
+        document_manager.start_partial_document,
+        document_id, content_hash, original_filename, file_path, page_count
+    )
+    try:
+        for number, chunk in enumerate(chunks, 1):
+            pages, timings = await chunk
+            metrics.record_all(timings)
+            publish = number & (number - 1) == 0 or number == len(chunks)
+            await asyncio.to_thread(add_pages, pages, publish)
+    except BaseException:
+        for chunk in chunks:
+            chunk.cancel()
+        raise
+    
+    return merger.result()
+
+# Endpoints below that touch SQLite are plain functions, which FastAPI runs in its threadpool
+@app.get("/jobs", response_model=List[JobResponse])
+def list_jobs():
+    """List ingestion jobs"""
+    return job_manager.get_all_jobs()
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job_status(job_id: str):
+    """Get ingestion job status"""
+    job = job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    
+    return job
+
+def question_cache_key(content_hash: str, question: str, *options: Any) -> tuple:
+    """Cache key of a question as parsed: case is ignored in its free text, but not in operators such as NEAR"""
+    query = similarity_search.parse_query(question)
+    return query_cache.make_key(content_hash, query.text, query.clauses, *options)
+
+async def run_query(func, *args) -> Any:
+    """Run question answering on the query threads once the query lane admits it"""
+    async with query_lane.admit():
+        loop = asyncio.get_running_loop()
+        # The copied context keeps stages timed on the thread in this request's Server-Timing
+        return await loop.run_in_executor(
+            query_executor, functools.partial(contextvars.copy_context().run, func, *args)
+        )
 
 @app.post("/ask", response_model=QuestionResponse)
 async def ask_question(request: QuestionRequest):
+    validate_scorer(request.scorer)
+    return await run_query(answer_question, request)
+
+def answer_question(request: QuestionRequest) -> Union[QuestionResponse, JSONResponse]:
     try:
         # Get document
-        document = document_manager.get_document(request.document_id)
+        with metrics.stage('ask.load'):
+            document = document_manager.get_document(request.document_id)
         if not document:
-            raise HTTPException(404, "Document not found")
+            raise document_not_found(request.document_id)
         
-        # Find relevant paragraphs
+        # Repeated questions are answered from the cache without rescoring;
+        # answers from a partially ingested document go stale and are not cached
         paragraphs = document['paragraphs']
-        results = similarity_search.find_relevant_paragraphs(
-            query=request.question,
-            paragraphs=paragraphs,
-            top_k=request.top_k,
-            context_paragraphs=request.context_paragraphs
-        )
+        scorer = request.scorer or similarity_search.default_scorer
+        progress = ingestion_progress(document)
+        with metrics.stage('ask.cache'):
+            cache_key = question_cache_key(
+                document['content_hash'], request.question,
+                request.top_k, request.context_paragraphs, scorer, request.response_format
+            )
+            formatted_results = None if progress else query_cache.get(cache_key)
+        if formatted_results is None:
+            # Find relevant paragraphs
+            results = similarity_search.find_relevant_paragraphs(
+                query=request.question,
+                paragraphs=paragraphs,
+                top_k=request.top_k,
+                context_paragraphs=request.context_paragraphs,
+                index=document['search_index'],
+                scorer=scorer
+            )
+            with metrics.stage('ask.format'):
+                if request.response_format == 'compact':
+                    formatted_results = compact_search_results(results, paragraphs, request.context_paragraphs)
+                else:
+                    formatted_results = [format_search_result(result) for result in results]
+            if not progress:
+                query_cache.put(cache_key, formatted_results)
         
-        # Format response
-        formatted_results = []
-        for result in results:
-            formatted_results.append({
-                'paragraph': {
-                    'text': result['paragraph']['text'],
-                    'page': result['paragraph']['page'],
-                    'paragraph_index': result['paragraph']['paragraph_index'],
-                    'similarity_score': result['similarity_score']
-                },
-                'context_before': [
-                    {
-                        'text': p['text'],
-                        'page': p['page'],
-                        'paragraph_index': p['paragraph_index'],
-                        'similarity_score': 0.0  # Context paragraphs don't have similarity scores
-                    }
-                    for p in result['context_before']
-                ],
-                'context_after': [
-                    {
-                        'text': p['text'],
-                        'page': p['page'],
-                        'paragraph_index': p['paragraph_index'],
-                        'similarity_score': 0.0
-                    }
-                    for p in result['context_after']
-                ]
+        if request.response_format == 'compact':
+            # Already plain JSON types, so Pydantic validation is skipped
+            return JSONResponse({
+                'document_id': request.document_id,
+                'document_title': document['document_title'],
+                'original_filename': document['original_filename'],
+                'response_format': 'compact',
+                **formatted_results,
+                'total_paragraphs_searched': len(paragraphs),
+                **progress
             })
         
         return QuestionResponse(
@@ -156,19 +520,144 @@ async def ask_question(request: QuestionRequest):
             document_title=document['document_title'],
             original_filename=document['original_filename'],
             results=formatted_results,
-            total_paragraphs_searched=len(paragraphs)
+            total_paragraphs_searched=len(paragraphs),
+            **progress
         )
-        
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"Error processing question: {str(e)}")
 
+@app.post("/ask/batch", response_model=BatchQuestionResponse)
+async def ask_questions_batch(request: BatchQuestionRequest):
+    """Answer many questions against one or more documents"""
+    validate_scorer(request.scorer)
+    return await run_query(answer_questions_batch, request)
+
+def answer_questions_batch(request: BatchQuestionRequest) -> BatchQuestionResponse:
+    documents = []
+    for document_id in request.document_ids:
+        document = document_manager.get_document(document_id)
+        if not document:
+            raise document_not_found(document_id)
+        documents.append(document)
+    
+    try:
+        answers = []
+        for document in documents:
+            scorer = request.scorer or similarity_search.default_scorer
+            progress = ingestion_progress(document)
+            cache_keys = [
+                question_cache_key(
+                    document['content_hash'], question,
+                    request.top_k, request.context_paragraphs, scorer, 'full'
+                )
+                for question in request.questions
+            ]
+            formatted_results = [None if progress else query_cache.get(key) for key in cache_keys]
+            
+            # All questions missing from the cache are scored together
+            missing = [i for i, results in enumerate(formatted_results) if results is None]
+            if missing:
+                batch_results = similarity_search.find_relevant_paragraphs_batch(
+                    queries=[request.questions[i] for i in missing],
+                    paragraphs=document['paragraphs'],
+                    top_k=request.top_k,
+                    context_paragraphs=request.context_paragraphs,
+                    index=document['search_index'],
+                    scorer=scorer
+                )
+                for i, results in zip(missing, batch_results):
+                    formatted_results[i] = [format_search_result(result) for result in results]
+                    if not progress:
+                        query_cache.put(cache_keys[i], formatted_results[i])
+            
+            for question, results in zip(request.questions, formatted_results):
+                answers.append({
+                    'question': question,
+                    'document_id': document['document_id'],
+                    'document_title': document['document_title'],
+                    'original_filename': document['original_filename'],
+                    'results': results,
+                    'total_paragraphs_searched': len(document['paragraphs']),
+                    **progress
+                })
+        
+        return BatchQuestionResponse(answers=answers)
+    
+    except Exception as e:
+        raise HTTPException(500, f"Error processing questions: {str(e)}")
+
+@app.post("/search", response_model=CorpusSearchResponse)
+async def search_documents(request: CorpusSearchRequest):
+    """Rank paragraphs across all documents, or across the given subset"""
+    return await run_query(search_corpus, request)
+
+def search_corpus(request: CorpusSearchRequest) -> CorpusSearchResponse:
+    try:
+        # The corpus index is keyed by content, shared by duplicate documents
+        content_hashes = None
+        if request.document_ids is not None:
+            content_hashes = sorted({
+                metadata['content_hash']
+                for metadata in map(document_manager.store.get_metadata, request.document_ids)
+                if metadata
+            })
+        
+        hits = document_manager.corpus_index.search(request.question, request.top_k, content_hashes)
+        documents_by_content = document_manager.store.documents_for_contents(
+            sorted({content_hash for content_hash, _, _ in hits})
+        )
+        
+        formatted_results = []
+        for content_hash, position, score in hits:
+            document_ids = documents_by_content.get(content_hash, [])
+            if request.document_ids is not None:
+                document_ids = [d for d in document_ids if d in request.document_ids]
+            if not document_ids:
+                continue
+            
+            # Report the oldest matching document for content uploaded more than once
+            document = document_manager.get_document(document_ids[0])
+            result = similarity_search.expand_context(
+                document['paragraphs'], position, score, request.context_paragraphs
+            )
+            formatted_results.append({'document_id': document_ids[0], **format_search_result(result)})
+        
+        return CorpusSearchResponse(
+            results=formatted_results,
+            total_paragraphs_searched=document_manager.corpus_index.count_paragraphs(content_hashes)
+        )
+    
+    except Exception as e:
+        raise HTTPException(500, f"Error searching documents: {str(e)}")
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Query result cache counters"""
+    return query_cache.stats()
+
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """Slots in use, queue depth and rejections of the query and ingestion lanes"""
+    return {lane.name: lane.stats() for lane in (query_lane, ingestion_lane)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Stage and request duration histograms plus lane queue depths in the Prometheus text format"""
+    return PlainTextResponse(
+        metrics.render_prometheus() + render_lane_metrics([query_lane, ingestion_lane]),
+        media_type='text/plain; version=0.0.4'
+    )
+
 @app.get("/documents")
-async def list_documents():
+def list_documents():
     """List all uploaded documents"""
     return document_manager.get_all_documents()
 
 @app.get("/documents/{document_id}")
-async def get_document_info(document_id: str):
+def get_document_info(document_id: str):
     """Get document information"""
     document = document_manager.get_document(document_id)
     if not document:
@@ -185,7 +674,7 @@ async def get_document_info(document_id: str):
     }
 
 @app.delete("/documents/{document_id}")
-async def delete_document(document_id: str):
+def delete_document(document_id: str):
     """Delete a document"""
     success = document_manager.delete_document(document_id)
     if not success:
@@ -193,6 +682,40 @@ async def delete_document(document_id: str):
     
     return {"message": "Document deleted successfully"}
 
+@app.on_event("startup")
+def recover_interrupted_ingestion():
+    """Fail the jobs and drop the partial documents of API processes that died mid-ingestion"""
+    live_owners = document_manager.store.live_owners()
+    if live_owners is None:
+        return
+    document_manager.store.discard_stale_partials(live_owners)
+    job_manager.fail_stale_jobs(live_owners)
+
+@app.on_event("startup")
+async def schedule_warm_up():
+    """Optionally load heavy libraries in the background; startup itself never waits for them"""
+    if config.WARMUP:
+        app.state.warm_up_task = asyncio.create_task(warm_up(config.WARMUP))
+
+async def warm_up(parts: set) -> None:
+    loop = asyncio.get_running_loop()
+    if parts & {'search', 'all'}:
+        await asyncio.to_thread(similarity_search.warm_up)
+        await asyncio.to_thread(stop_words)
+    if parts & {'ingestion', 'all'}:
+        # The API process itself only counts PDF pages; extraction runs in the workers
+        await asyncio.to_thread(text_processor.warm_up, ['application/pdf'])
+        await asyncio.gather(*(
+            loop.run_in_executor(ingestion_executor, warm_up_worker, document_manager.upload_dir)
+            for _ in range(config.INGESTION_WORKERS)
+        ))
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    ingestion_executor.shutdown(wait=False, cancel_futures=True)
+    query_executor.shutdown(wait=False, cancel_futures=True)
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Workers share the document store, so any of them can serve any document
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=config.API_WORKERS)
\ No newline at end of file
@@ -0,0 +1,109 @@
+import numpy as np
+from typing import List, Dict, Any, Iterator, Union
+
+# Numeric paragraph fields and the array type each one is stored with
+PARAGRAPH_COLUMNS = {
+    'page': np.int32,
+    'paragraph_index': np.int32,
+    'start_position': np.int64,
+    'end_position': np.int64
+}
+PARAGRAPH_FIELDS = ('text',) + tuple(PARAGRAPH_COLUMNS)
+
+class Paragraph:
+    """Read-only view of one row of a ParagraphTable
+    
+    Supports both attribute access and the paragraph['text'] style used for
+    extracted paragraph dicts, without copying anything out of the table.
+    """
+    __slots__ = ('table', 'row')
+    
+    def __init__(self, table: 'ParagraphTable', row: int):
+        self.table = table
+        self.row = row
+    
+    @property
+    def text(self) -> str:
+        return self.table.text(self.row)
+    
+    @property
+    def page(self) -> int:
+        return int(self.table.columns['page'][self.row])
+    
+    @property
+    def paragraph_index(self) -> int:
+        return int(self.table.columns['paragraph_index'][self.row])
+    
+    @property
+    def start_position(self) -> int:
+        return int(self.table.columns['start_position'][self.row])
+    
+    @property
+    def end_position(self) -> int:
+        return int(self.table.columns['end_position'][self.row])
+    
+    def __getitem__(self, field: str) -> Union[str, int]:
+        if field not in PARAGRAPH_FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in PARAGRAPH_FIELDS}
+
+class ParagraphTable:
+    """Columnar paragraph storage: one UTF-8 text buffer with offsets plus typed columns"""
+    def __init__(self, text_buffer: np.ndarray, text_offsets: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.text_buffer = text_buffer  # uint8, all paragraph texts back to back
+        self.text_offsets = text_offsets  # int64, n + 1 byte offsets into text_buffer
+        self.columns = columns
+    
+    @classmethod
+    def from_paragraphs(cls, paragraphs: List[Dict[str, Any]]) -> 'ParagraphTable':
+        """Pack extracted paragraph dicts into columns"""
+        encoded = [p['text'].encode('utf-8') for p in paragraphs]
+        text_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in encoded], out=text_offsets[1:])
+        columns = {
+            column: np.array([p[column] for p in paragraphs], dtype=dtype)
+            for column, dtype in PARAGRAPH_COLUMNS.items()
+        }
+        text_buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(text_buffer, text_offsets, columns)
+    
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'ParagraphTable':
+        """Wrap stored (possibly memory-mapped) arrays without copying them"""
+        columns = {column: arrays[column] for column in PARAGRAPH_COLUMNS}
+        return cls(arrays['text'], arrays['text_offsets'], columns)
+    
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {'text': self.text_buffer, 'text_offsets': self.text_offsets, **self.columns}
+    
+    def __len__(self) -> int:
+        return len(self.text_offsets) - 1
+    
+    def __getitem__(self, row: int) -> Paragraph:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return Paragraph(self, row)
+    
+    def __iter__(self) -> Iterator[Paragraph]:
+        for row in range(len(self)):
+            yield Paragraph(self, row)
+    
+    def text(self, row: int) -> str:
+        start, end = self.text_offsets[row], self.text_offsets[row + 1]
+        return self.text_buffer[start:end].tobytes().decode('utf-8')
+    
+    def texts(self) -> Iterator[str]:
+        for row in range(len(self)):
+            yield self.text(row)
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the text buffer and columns"""
+        return self.text_buffer.nbytes + self.text_offsets.nbytes + sum(
+            column.nbytes for column in self.columns.values()
+        )
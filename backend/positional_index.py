@@ -0,0 +1,159 @@
+import re
+import numpy as np
+from typing import Dict, Any, List, Optional, Callable, NamedTuple, Tuple, Union
+
+# Occurrences are encoded as paragraph << 32 | position, so sorting them sorts by paragraph, then position
+POSITION_BITS = 32
+
+# A quoted phrase or a single word, on either side of NEAR/k
+OPERAND = r'"[^"]*"|\w+'
+NEAR_PATTERN = re.compile(rf'({OPERAND})\s+NEAR/(\d+)\s+({OPERAND})')
+PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+
+class Phrase(NamedTuple):
+    """Words that must appear consecutively in a paragraph"""
+    words: Tuple[str, ...]
+
+class Near(NamedTuple):
+    """Two phrases in either order with at most `distance` words between them"""
+    left: Tuple[str, ...]
+    right: Tuple[str, ...]
+    distance: int
+
+class PhraseQuery(NamedTuple):
+    """A parsed question; hashable, so it can key cached results"""
+    text: str  # The question without quotes and operators, for ranked scoring
+    clauses: Tuple[Union[Phrase, Near], ...]  # Every clause must match
+
+def parse_query(question: str, tokenize: Callable[[str], List[str]]) -> PhraseQuery:
+    """Split a question into free text plus "quoted phrase" and `a NEAR/k b` clauses
+    
+    NEAR is only recognized in upper case, so the plain word "near" stays text.
+    """
+    clauses: List[Union[Phrase, Near]] = []
+    
+    def near(match: re.Match) -> str:
+        left, distance, right = match.groups()
+        clause = Near(tuple(tokenize(left)), tuple(tokenize(right)), int(distance))
+        if clause.left and clause.right:
+            clauses.append(clause)
+        return ' '.join(operand.strip('"') for operand in (left, right))
+    
+    def phrase(match: re.Match) -> str:
+        words = tuple(tokenize(match.group(1)))
+        if words:  # Quotes around no words constrain nothing
+            clauses.append(Phrase(words))
+        return match.group(1)
+    
+    text = PHRASE_PATTERN.sub(phrase, NEAR_PATTERN.sub(near, question))
+    return PhraseQuery(text, tuple(clauses))
+
+class PositionalIndex:
+    """Positions of every word in every paragraph, as one posting list per term
+    
+    The postings of term column c are rows[indptr[c]:indptr[c + 1]] and
+    positions[indptr[c]:indptr[c + 1]], ordered by paragraph then position.
+    Term columns are those of the BM25 vocabulary. Phrases and proximity are
+    answered by intersecting posting lists, never by reading paragraph text.
+    """
+    def __init__(self, indptr: np.ndarray, rows: np.ndarray, positions: np.ndarray):
+        self.indptr = indptr
+        self.rows = rows
+        self.positions = positions
+    
+    @classmethod
+    def build(cls, token_lists: List[List[str]], terms: Dict[str, int]) -> 'PositionalIndex':
+        """Index the word tokens of each paragraph; every token must be in terms"""
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+        cols = np.fromiter(
+            (terms[token] for tokens in token_lists for token in tokens), dtype=np.int64, count=int(lengths.sum())
+        )
+        rows = np.repeat(np.arange(len(token_lists)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        positions = np.arange(len(cols)) - np.repeat(starts, lengths)
+        return cls.from_postings(rows, cols, positions, len(terms))
+    
+    @classmethod
+    def from_postings(cls,
+                      rows: np.ndarray,
+                      cols: np.ndarray,
+                      positions: np.ndarray,
+                      term_count: int) -> 'PositionalIndex':
+        """Group (paragraph, term column, position) triples into per-term posting lists"""
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        positions = np.asarray(positions, dtype=np.int64)
+        order = np.lexsort((positions, rows, cols))
+        indptr = np.zeros(term_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=term_count), out=indptr[1:])
+        return cls(indptr, rows[order].astype(np.int32), positions[order].astype(np.int32))
+    
+    def occurrences(self, col: Optional[int]) -> np.ndarray:
+        """Sorted encoded (paragraph, position) pairs of one term column"""
+        if col is None:
+            return np.array([], dtype=np.int64)
+        start, end = self.indptr[col], self.indptr[col + 1]
+        return (self.rows[start:end].astype(np.int64) << POSITION_BITS) + self.positions[start:end]
+    
+    def phrase(self, terms: Dict[str, int], words: Tuple[str, ...]) -> np.ndarray:
+        """Encoded (paragraph, position) pairs where the phrase starts"""
+        cols = [terms.get(word) for word in words]
+        # Rarest term first, so the candidate set is as small as possible from the start
+        order = sorted(range(len(cols)), key=lambda i: self._posting_count(cols[i]))
+        starts = self.occurrences(cols[order[0]]) - order[0]
+        for i in order[1:]:
+            if not starts.size:
+                break
+            starts = np.intersect1d(starts, self.occurrences(cols[i]) - i, assume_unique=True)
+        return starts
+    
+    def near(self, terms: Dict[str, int], clause: Near) -> np.ndarray:
+        """Paragraphs with at most clause.distance words between the two phrases of a NEAR clause"""
+        left = self.phrase(terms, clause.left)
+        right = self.phrase(terms, clause.right)
+        if not left.size or not right.size:
+            return np.array([], dtype=np.int64)
+        return np.union1d(
+            _followed_within(left, len(clause.left), right, clause.distance),
+            _followed_within(right, len(clause.right), left, clause.distance)
+        )
+    
+    def matches(self, terms: Dict[str, int], clauses: Tuple[Union[Phrase, Near], ...], paragraph_count: int) -> np.ndarray:
+        """Boolean mask of the paragraphs satisfying every clause"""
+        mask = np.ones(paragraph_count, dtype=bool)
+        for clause in clauses:
+            if isinstance(clause, Phrase):
+                rows = self.phrase(terms, clause.words) >> POSITION_BITS
+            else:
+                rows = self.near(terms, clause)
+            clause_mask = np.zeros(paragraph_count, dtype=bool)
+            clause_mask[rows] = True
+            mask &= clause_mask
+        return mask
+    
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'positions_indptr': self.indptr,
+            'positions_rows': self.rows,
+            'positions_offsets': self.positions
+        }
+    
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Any]) -> Optional['PositionalIndex']:
+        """Rebuild around (possibly memory-mapped) stored arrays, None for indexes stored without positions"""
+        if 'positions_indptr' not in arrays:
+            return None
+        return cls(arrays['positions_indptr'], arrays['positions_rows'], arrays['positions_offsets'])
+    
+    def _posting_count(self, col: Optional[int]) -> int:
+        return 0 if col is None else int(self.indptr[col + 1] - self.indptr[col])
+
+def _followed_within(first: np.ndarray, first_length: int, second: np.ndarray, distance: int) -> np.ndarray:
+    """Paragraphs where an occurrence in `second` starts at most `distance` words after one in `first` ends"""
+    # Position right after each first occurrence; the closest second occurrence at or past it decides
+    ends = first + first_length
+    following = np.searchsorted(second, ends)
+    found = following < len(second)
+    gaps = second[following[found]] - ends[found]
+    same_paragraph = (second[following[found]] >> POSITION_BITS) == (ends[found] >> POSITION_BITS)
+    return np.unique(first[found][same_paragraph & (gaps <= distance)] >> POSITION_BITS)
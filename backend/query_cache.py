@@ -0,0 +1,95 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+class QueryCache:
+    """Bounded LRU cache of question results with TTL expiry
+
+    Keys start with the content hash of the document, so duplicate uploads
+    share entries and everything cached for a content can be dropped at once.
+    """
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()  # key -> (expiry, value)
+        self.keys_by_content: Dict[str, Set[Tuple]] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    @staticmethod
+    def make_key(content_hash: str, question: str, *options: Hashable) -> Tuple:
+        """Cache key with the question normalized for case and whitespace"""
+        normalized_question = re.sub(r'\s+', ' ', question).strip().lower()
+        return (content_hash, normalized_question) + options
+    
+    def get(self, key: Tuple) -> Optional[Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            expiry, value = entry
+            if expiry < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key: Tuple, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.keys_by_content.setdefault(key[0], set()).add(key)
+            
+            # Evict least recently used entries
+            while len(self.entries) > self.max_size:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+    
+    def invalidate(self, content_hash: str) -> None:
+        """Drop every entry cached for a content hash"""
+        with self.lock:
+            for key in list(self.keys_by_content.get(content_hash, ())):
+                self._remove(key)
+    
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_content.clear()
+    
+    def _remove(self, key: Tuple) -> None:
+        del self.entries[key]
+        content_keys = self.keys_by_content.get(key[0])
+        if content_keys is not None:
+            content_keys.discard(key)
+            if not content_keys:
+                del self.keys_by_content[key[0]]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
@@ -0,0 +1,69 @@
+import re
+from typing import Dict, Any, Iterator, Optional, Pattern
+
+# Paragraph breaks in text extracted from PDF pages
+PDF_SEPARATOR = re.compile(
+    r'\n\s*\n'  # Double newlines
+    r'|\n(?=\s*[A-Z])'  # Newline followed by capital letter
+    r'|(?<=[.!?])\s+\n'  # End of sentence followed by newline
+)
+
+# Paragraph breaks in plain text files
+BLANK_LINE_SEPARATOR = re.compile(r'\n\s*\n')
+
+class Segmenter:
+    """Single-pass paragraph splitter with exact character offsets
+    
+    The separator pattern is compiled once and scanned with finditer, so
+    splitting is linear in the text length. Offsets point into the text the
+    caller indexes (base_offset shifts them into a larger document text).
+    """
+    def __init__(self, separator: Optional[Pattern] = None, min_length: int = 10):
+        self.separator = separator  # None keeps the whole text as one piece
+        self.min_length = min_length  # Trimmed pieces must be longer than this
+    
+    def paragraphs(self,
+                   text: str,
+                   page: int,
+                   base_offset: int = 0,
+                   first_number: int = 1) -> Iterator[Dict[str, Any]]:
+        """Yield paragraph dicts for the pieces of text between separators
+        
+        Pieces are numbered from first_number, counting the ones that are too
+        short to keep, which matches how paragraph_index has always been assigned.
+        """
+        number = first_number
+        position = 0
+        if self.separator is not None:
+            for match in self.separator.finditer(text):
+                paragraph = self._paragraph(text, position, match.start(), page, number, base_offset)
+                if paragraph is not None:
+                    yield paragraph
+                number += 1
+                position = match.end()
+        
+        paragraph = self._paragraph(text, position, len(text), page, number, base_offset)
+        if paragraph is not None:
+            yield paragraph
+    
+    def _paragraph(self,
+                   text: str,
+                   start: int,
+                   end: int,
+                   page: int,
+                   number: int,
+                   base_offset: int) -> Optional[Dict[str, Any]]:
+        piece = text[start:end]
+        stripped = piece.strip()
+        if len(stripped) <= self.min_length:
+            return None
+        
+        # Offsets of the trimmed text, not of the raw piece
+        start += len(piece) - len(piece.lstrip())
+        return {
+            'text': stripped,
+            'page': page,
+            'paragraph_index': number,
+            'start_position': base_offset + start,
+            'end_position': base_offset + start + len(stripped)
+        }
@@ -1,74 +1,574 @@
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import List, Dict, Any
+from scipy.sparse import csr_matrix, csc_matrix
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple, Callable
 import re
 
+# scikit-learn takes about a second to import, so it is imported where first needed;
+# replicas that only use BM25 or keyword scoring on stored documents never load it
+
+from instrumentation import metrics
+from vector_index import VectorIndex
+from positional_index import PositionalIndex, PhraseQuery, parse_query
+
+# Plain word tokens, used for BM25 and keyword matching (stop words are left to IDF)
+WORD_PATTERN = re.compile(r'\w+')
+
+def word_tokens(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+class SearchIndex:
+    """Per-document search index, built once when the document is uploaded"""
+    def __init__(self,
+                 vocabulary: Dict[str, int],
+                 idf: Optional[np.ndarray],
+                 matrix: Optional[csr_matrix],
+                 terms: Dict[str, int],
+                 term_weights: csc_matrix,
+                 semantic: Optional[VectorIndex] = None,
+                 positions: Optional[PositionalIndex] = None):
+        # TF-IDF part, None when the document has no usable vocabulary
+        self.vocabulary = vocabulary  # term -> column
+        self.idf = idf
+        self.matrix = matrix  # L2-normalized paragraph vectors, one row per paragraph
+        # BM25 part: precomputed weights, each column is the posting list of one word
+        self.terms = terms  # word -> column
+        self.term_weights = term_weights
+        # Dense LSA part, None for small documents and partial snapshots
+        self.semantic = semantic
+        # Word positions over the BM25 terms, for quoted phrases and NEAR/k
+        self.positions = positions
+    
+    @property
+    def paragraph_count(self) -> int:
+        return self.term_weights.shape[0]
+    
+    def to_data(self) -> Dict[str, Any]:
+        """Flatten into term lists plus plain arrays for persistence"""
+        arrays = {
+            'paragraph_count': np.array([self.paragraph_count], dtype=np.int64),
+            'term_weights_data': self.term_weights.data,
+            'term_weights_indices': self.term_weights.indices,
+            'term_weights_indptr': self.term_weights.indptr
+        }
+        if self.matrix is not None:
+            arrays.update({
+                'idf': self.idf,
+                'matrix_data': self.matrix.data,
+                'matrix_indices': self.matrix.indices,
+                'matrix_indptr': self.matrix.indptr
+            })
+        if self.semantic is not None:
+            arrays.update(self.semantic.to_arrays())
+        if self.positions is not None:
+            arrays.update(self.positions.to_arrays())
+        vocabulary = {
+            'tfidf': _term_list(self.vocabulary),
+            'terms': _term_list(self.terms)
+        }
+        if self.semantic is not None:
+            vocabulary['lsa'] = _term_list(self.semantic.vocabulary)
+        return {'vocabulary': vocabulary, 'arrays': arrays}
+    
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> 'SearchIndex':
+        """Rebuild an index around (possibly memory-mapped) stored arrays"""
+        arrays = data['arrays']
+        vocabulary = {term: col for col, term in enumerate(data['vocabulary']['tfidf'])}
+        terms = {term: col for col, term in enumerate(data['vocabulary']['terms'])}
+        paragraph_count = int(arrays['paragraph_count'][0])
+        
+        term_weights = csc_matrix(
+            (arrays['term_weights_data'], arrays['term_weights_indices'], arrays['term_weights_indptr']),
+            shape=(paragraph_count, len(terms)), copy=False
+        )
+        idf = matrix = None
+        if 'matrix_indptr' in arrays:
+            matrix = csr_matrix(
+                (arrays['matrix_data'], arrays['matrix_indices'], arrays['matrix_indptr']),
+                shape=(paragraph_count, len(vocabulary)), copy=False
+            )
+            idf = arrays['idf']
+        return cls(
+            vocabulary, idf, matrix, terms, term_weights,
+            VectorIndex.from_arrays(arrays, data['vocabulary'].get('lsa')), PositionalIndex.from_arrays(arrays)
+        )
+
+def _term_list(vocabulary: Dict[str, int]) -> List[str]:
+    terms = [''] * len(vocabulary)
+    for term, col in vocabulary.items():
+        terms[col] = term
+    return terms
+
+class Scorer:
+    """Scores the paragraphs of one indexed document against a batch of queries"""
+    min_score = 0.0  # Paragraphs must score above this to be returned
+    
+    def score(self, queries: List[str], index: SearchIndex) -> np.ndarray:
+        """Return an (n_paragraphs, n_queries) array of scores"""
+        raise NotImplementedError
+
+class KeywordScorer(Scorer):
+    """Share of query words present in the paragraph, read from the term postings"""
+    def score(self, queries: List[str], index: SearchIndex) -> np.ndarray:
+        postings = index.term_weights
+        scores = np.zeros((index.paragraph_count, len(queries)))
+        for column, query in enumerate(queries):
+            query_terms = set(word_tokens(query))
+            for term in query_terms:
+                col = index.terms.get(term)
+                if col is not None:
+                    scores[postings.indices[postings.indptr[col]:postings.indptr[col + 1]], column] += 1.0
+            if query_terms:
+                scores[:, column] /= len(query_terms)
+        return scores
+
+class TfidfScorer(Scorer):
+    """Cosine similarity between TF-IDF vectors"""
+    min_score = 0.1  # Minimum similarity threshold
+    
+    def __init__(self, vectorizer_params: Dict[str, Any], fallback: Scorer):
+        self.vectorizer_params = vectorizer_params
+        self.fallback = fallback
+        self._analyzer = None
+    
+    @property
+    def analyzer(self) -> Callable[[str], List[str]]:
+        """Tokenizer, stop words and n-grams of the index vectorizer, built on first use"""
+        if self._analyzer is None:
+            self._analyzer = build_analyzer(self.vectorizer_params)
+        return self._analyzer
+    
+    def score(self, queries: List[str], index: SearchIndex) -> np.ndarray:
+        if index.matrix is None:
+            # Fallback to simple keyword matching if TF-IDF has no vocabulary
+            return self.fallback.score(queries, index)
+        # Rows are L2-normalized, so one sparse product gives cosine similarities
+        query_vectors = vectorize_queries(queries, self.analyzer, index.vocabulary, index.idf)
+        return index.matrix.dot(query_vectors.T).toarray()
+
+class SemanticScorer(Scorer):
+    """Cosine similarity between LSA vectors, searched approximately through the IVF clusters
+    
+    Paragraphs outside the probed clusters score 0. Indexes without vectors
+    (small documents, documents stored before LSA) are scored with TF-IDF.
+    """
+    min_score = 0.1
+    
+    def __init__(self, vectorizer_params: Dict[str, Any], tfidf: TfidfScorer, probes: int = 8):
+        self.vectorizer_params = vectorizer_params  # Those of the LSA vocabulary, not the TF-IDF scorer's
+        self.tfidf = tfidf
+        self.probes = probes
+        self._analyzer = None
+    
+    @property
+    def analyzer(self) -> Callable[[str], List[str]]:
+        if self._analyzer is None:
+            self._analyzer = build_analyzer(self.vectorizer_params)
+        return self._analyzer
+    
+    def score(self, queries: List[str], index: SearchIndex) -> np.ndarray:
+        if index.semantic is None:
+            return self.tfidf.score(queries, index)
+        semantic = index.semantic
+        query_vectors = vectorize_queries(queries, self.analyzer, semantic.vocabulary, semantic.idf)
+        scores = np.zeros((index.paragraph_count, len(queries)))
+        for column, query in enumerate(semantic.project(query_vectors)):
+            rows, similarities = semantic.search(query, self.probes)
+            scores[rows, column] = similarities
+        return scores
+
+def build_analyzer(vectorizer_params: Dict[str, Any]) -> Callable[[str], List[str]]:
+    """Tokenizer, stop words and n-grams of a TfidfVectorizer with these parameters"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    return TfidfVectorizer(**vectorizer_params).build_analyzer()
+
+def vectorize_queries(queries: List[str],
+                      analyzer: Callable[[str], List[str]],
+                      vocabulary: Dict[str, int],
+                      idf: np.ndarray) -> csr_matrix:
+    """Project queries onto a fitted TF-IDF vocabulary as L2-normalized sparse rows"""
+    with metrics.stage('search.vectorize'):
+        rows, cols = [], []
+        for row, query in enumerate(queries):
+            for term in analyzer(query):
+                col = vocabulary.get(term)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        
+        # Repeated (row, col) pairs are summed into term counts
+        counts = csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(len(queries), len(idf))
+        )
+        return l2_normalize(counts.multiply(idf).tocsr())
+
+class HybridScorer(Scorer):
+    """LSA candidates reranked together with TF-IDF: a weighted sum of both cosine similarities
+    
+    Paragraphs matching the exact terms keep their TF-IDF score even when the
+    approximate search did not reach their cluster.
+    """
+    min_score = 0.1
+    
+    def __init__(self, semantic: SemanticScorer, weight: float = 0.5):
+        self.semantic = semantic
+        self.weight = weight  # Share of the LSA similarity, the rest is TF-IDF
+    
+    def score(self, queries: List[str], index: SearchIndex) -> np.ndarray:
+        if index.semantic is None:
+            return self.semantic.tfidf.score(queries, index)
+        sparse = self.semantic.tfidf.score(queries, index)
+        return self.weight * self.semantic.score(queries, index) + (1 - self.weight) * sparse
+
+class Bm25Scorer(Scorer):
+    """Okapi BM25 over term weights precomputed at index time"""
+    def score(self, queries: List[str], index: SearchIndex) -> np.ndarray:
+        rows, cols = [], []
+        for column, query in enumerate(queries):
+            for term in word_tokens(query):
+                col = index.terms.get(term)
+                if col is not None:
+                    rows.append(col)
+                    cols.append(column)
+        
+        query_counts = csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(len(index.terms), len(queries))
+        )
+        # Only the posting lists of the query terms take part in the product
+        return (index.term_weights @ query_counts).toarray()
+    
+    @staticmethod
+    def term_weights(token_lists: List[List[str]],
+                     k1: float = 1.5,
+                     b: float = 0.75) -> Tuple[Dict[str, int], csc_matrix]:
+        """Vocabulary and CSC matrix of idf * saturated tf for every (paragraph, term)"""
+        terms: Dict[str, int] = {}
+        rows, cols, counts = [], [], []
+        for row, tokens in enumerate(token_lists):
+            for term, count in Counter(tokens).items():
+                rows.append(row)
+                cols.append(terms.setdefault(term, len(terms)))
+                counts.append(count)
+        
+        lengths = [len(tokens) for tokens in token_lists]
+        return terms, Bm25Scorer.weights_from_counts(rows, cols, counts, lengths, len(terms), k1, b)
+    
+    @staticmethod
+    def weights_from_counts(rows: List[int],
+                            cols: List[int],
+                            counts: List[int],
+                            lengths: List[int],
+                            term_count: int,
+                            k1: float = 1.5,
+                            b: float = 0.75) -> csc_matrix:
+        """BM25 weight matrix from (paragraph, term, count) triples and paragraph lengths"""
+        n = len(lengths)
+        rows = np.array(rows, dtype=np.int64)
+        cols = np.array(cols, dtype=np.int64)
+        tf = np.array(counts, dtype=np.float64)
+        lengths = np.array(lengths, dtype=np.float64)
+        average_length = max(lengths.mean(), 1.0) if n else 1.0
+        
+        document_frequency = np.bincount(cols, minlength=term_count)
+        idf = np.log(1 + (n - document_frequency + 0.5) / (document_frequency + 0.5))
+        
+        weights = idf[cols] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[rows] / average_length))
+        return csc_matrix((weights, (rows, cols)), shape=(n, term_count))
+
+class IncrementalIndex:
+    """Search index that grows batch by batch while a document is still being ingested
+    
+    Each paragraph is tokenized once, when it is added. snapshot() turns the
+    counts gathered so far into a SearchIndex, recomputing IDF, vocabulary
+    pruning and BM25 weights over the paragraphs seen, the way build_index
+    would for the same paragraphs. Snapshots carry no LSA vectors, refitting
+    them per batch would cost more than the batch itself.
+    """
+    def __init__(self, analyzer, min_df: int = 1, max_df: float = 1.0, max_features: Optional[int] = None):
+        self.analyzer = analyzer
+        # Vocabulary pruning, with TfidfVectorizer's meaning
+        self.min_df = min_df
+        self.max_df = max_df
+        self.max_features = max_features
+        self.vocabulary: Dict[str, int] = {}
+        self.terms: Dict[str, int] = {}
+        # (paragraph, column, count) triples for the TF-IDF and BM25 parts
+        self.tfidf_counts: Tuple[List[int], List[int], List[int]] = ([], [], [])
+        self.bm25_counts: Tuple[List[int], List[int], List[int]] = ([], [], [])
+        self.lengths: List[int] = []  # Word tokens per paragraph, for BM25
+        self.token_columns: List[int] = []  # BM25 term column of every word token, in document order
+    
+    @property
+    def paragraph_count(self) -> int:
+        return len(self.lengths)
+    
+    def add(self, texts: List[str]) -> None:
+        """Tokenize and count the next paragraphs of the document"""
+        with metrics.stage('index.incremental'):
+            for text in texts:
+                row = self.paragraph_count
+                _add_counts(self.tfidf_counts, self.vocabulary, row, self.analyzer(text))
+                tokens = word_tokens(text)
+                _add_counts(self.bm25_counts, self.terms, row, tokens)
+                self.token_columns.extend(self.terms[token] for token in tokens)
+                self.lengths.append(len(tokens))
+    
+    def snapshot(self) -> Optional[SearchIndex]:
+        """SearchIndex over every paragraph added so far"""
+        n = self.paragraph_count
+        if n == 0:
+            return None
+        
+        with metrics.stage('index.snapshot'):
+            vocabulary, idf, matrix = {}, None, None
+            rows, cols, counts = self.tfidf_counts
+            counts = csr_matrix(
+                (np.array(counts, dtype=np.float64), (rows, cols)), shape=(n, len(self.vocabulary))
+            )
+            columns = self._kept_columns(counts, np.bincount(cols, minlength=len(self.vocabulary)))
+            if columns.size:
+                # A new vocabulary per snapshot: later batches add terms beyond these columns
+                term_list = _term_list(self.vocabulary)
+                vocabulary = {term_list[col]: new_col for new_col, col in enumerate(columns)}
+                counts = counts[:, columns]
+                # Same smoothed IDF and L2 normalization as TfidfVectorizer
+                document_frequency = np.bincount(counts.indices, minlength=len(columns))
+                idf = np.log((1 + n) / (1 + document_frequency)) + 1
+                matrix = l2_normalize(counts.multiply(idf).tocsr())
+            
+            terms = dict(self.terms)
+            term_weights = Bm25Scorer.weights_from_counts(*self.bm25_counts, self.lengths, len(terms))
+            lengths = np.array(self.lengths, dtype=np.int64)
+            positions = PositionalIndex.from_postings(
+                np.repeat(np.arange(n), lengths),
+                np.array(self.token_columns, dtype=np.int64),
+                np.arange(len(self.token_columns)) - np.repeat(np.cumsum(lengths) - lengths, lengths),
+                len(terms)
+            )
+            return SearchIndex(vocabulary, idf, matrix, terms, term_weights, positions=positions)
+    
+    def _kept_columns(self, counts: csr_matrix, document_frequency: np.ndarray) -> np.ndarray:
+        """Columns surviving min_df, max_df and max_features, in column order"""
+        n = counts.shape[0]
+        max_doc_count = self.max_df * n if isinstance(self.max_df, float) else self.max_df
+        keep = (document_frequency >= self.min_df) & (document_frequency <= max_doc_count)
+        columns = np.flatnonzero(keep)
+        if self.max_features is not None and columns.size > self.max_features:
+            # Most frequent terms across the document win, as in TfidfVectorizer. Ties are broken
+            # the same way too: the same argsort over the columns in alphabetical term order.
+            term_list = _term_list(self.vocabulary)
+            columns = np.array(sorted(columns, key=lambda col: term_list[col]), dtype=np.int64)
+            term_frequency = np.asarray(counts.sum(axis=0)).ravel()
+            columns = np.sort(columns[(-term_frequency[columns]).argsort()[:self.max_features]])
+        return columns
+
+def _add_counts(triples: Tuple[List[int], List[int], List[int]],
+                vocabulary: Dict[str, int],
+                row: int,
+                tokens: List[str]) -> None:
+    rows, cols, counts = triples
+    for term, count in Counter(tokens).items():
+        rows.append(row)
+        cols.append(vocabulary.setdefault(term, len(vocabulary)))
+        counts.append(count)
+
 class SimilaritySearch:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(
-            max_features=1000,
-            stop_words='english',
-            ngram_range=(1, 2),
-            min_df=1,
-            max_df=0.8
+    def __init__(self,
+                 default_scorer: str = 'tfidf',
+                 lsa_dimensions: int = 100,
+                 ivf_probes: int = 8,
+                 hybrid_weight: float = 0.5):
+        self.vectorizer_params = {
+            'max_features': 1000,
+            'stop_words': 'english',
+            'ngram_range': (1, 2),
+            'min_df': 1,
+            'max_df': 0.8
+        }
+        # LSA gets a vocabulary of its own, 20 times larger, so it also sees the rarer terms;
+        # the cap bounds its (dimensions x vocabulary) projection for very long documents
+        self.lsa_vectorizer_params = {**self.vectorizer_params, 'max_features': 20000}
+        self.lsa_dimensions = lsa_dimensions  # 0 builds no dense vectors
+        keyword_scorer = KeywordScorer()
+        tfidf_scorer = TfidfScorer(self.vectorizer_params, keyword_scorer)
+        semantic_scorer = SemanticScorer(self.lsa_vectorizer_params, tfidf_scorer, ivf_probes)
+        self.scorers = {
+            'tfidf': tfidf_scorer,
+            'bm25': Bm25Scorer(),
+            'keyword': keyword_scorer,
+            'semantic': semantic_scorer,
+            'hybrid': HybridScorer(semantic_scorer, hybrid_weight)
+        }
+        self.default_scorer = default_scorer
+        self.get_scorer(default_scorer)  # Fail fast on a misconfigured default
+    
+    @property
+    def analyzer(self) -> Callable[[str], List[str]]:
+        # The analyzer holds no fitted state, so one instance is safe to share across requests
+        return self.scorers['tfidf'].analyzer
+    
+    def warm_up(self) -> None:
+        """Import scikit-learn and build the analyzers ahead of the first request"""
+        self.analyzer
+        self.scorers['semantic'].analyzer
+        l2_normalize(csr_matrix((1, 1)))
+    
+    def get_scorer(self, name: Optional[str] = None) -> Scorer:
+        """Look up a scorer by name, defaulting to the deployment-wide choice"""
+        name = name or self.default_scorer
+        if name not in self.scorers:
+            raise ValueError(f"Unknown scorer: {name}")
+        return self.scorers[name]
+    
+    def build_index(self, paragraphs: List[Dict[str, Any]]) -> Optional[SearchIndex]:
+        """Fit TF-IDF and LSA on the document and precompute BM25 and positional postings
+        
+        LSA gets its own vectorizer (lsa_vectorizer_params) rather than the
+        TF-IDF scorer's capped vocabulary; both are fitted on this document only.
+        """
+        if not paragraphs:
+            return None
+        texts = [p['text'] for p in paragraphs]
+        
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        
+        # A fresh vectorizer per document keeps concurrent uploads independent
+        vectorizer = TfidfVectorizer(**self.vectorizer_params)
+        vocabulary, idf, matrix = {}, None, None
+        with metrics.stage('index.tfidf'):
+            try:
+                matrix = vectorizer.fit_transform(texts).tocsr()
+                vocabulary = {term: int(col) for term, col in vectorizer.vocabulary_.items()}
+                idf = vectorizer.idf_
+            except ValueError:
+                # No usable vocabulary, the TF-IDF scorer falls back to keyword matching
+                pass
+        
+        semantic = None
+        if matrix is not None and self.lsa_dimensions > 0:
+            with metrics.stage('index.lsa'):
+                semantic = VectorIndex.build(texts, self.lsa_vectorizer_params, self.lsa_dimensions)
+        
+        token_lists = [word_tokens(text) for text in texts]
+        with metrics.stage('index.bm25'):
+            terms, term_weights = Bm25Scorer.term_weights(token_lists)
+        with metrics.stage('index.positions'):
+            positions = PositionalIndex.build(token_lists, terms)
+        return SearchIndex(vocabulary, idf, matrix, terms, term_weights, semantic, positions)
+    
+    def incremental_index(self) -> IncrementalIndex:
+        """Empty index for a document whose paragraphs arrive in batches"""
+        return IncrementalIndex(
+            self.analyzer,
+            self.vectorizer_params['min_df'],
+            self.vectorizer_params['max_df'],
+            self.vectorizer_params['max_features']
         )
     
-    def find_relevant_paragraphs(self, 
-                               query: str, 
-                               paragraphs: List[Dict[str, Any]], 
+    def find_relevant_paragraphs(self,
+                               query: str,
+                               paragraphs: List[Dict[str, Any]],
                                top_k: int = 5,
-                               context_paragraphs: int = 5) -> List[Dict[str, Any]]:
+                               context_paragraphs: int = 5,
+                               index: Optional[SearchIndex] = None,
+                               scorer: Optional[str] = None) -> List[Dict[str, Any]]:
         """Find most relevant paragraphs with context"""
-        if not paragraphs:
-            return []
-        
-        # Prepare texts for vectorization
-        paragraph_texts = [p['text'] for p in paragraphs]
-        all_texts = [query] + paragraph_texts
+        return self.find_relevant_paragraphs_batch(
+            [query], paragraphs, top_k, context_paragraphs, index, scorer
+        )[0]
+    
+    def parse_query(self, query: str) -> PhraseQuery:
+        """Split a query into the free text to rank on and the phrase and NEAR clauses results must match"""
+        return parse_query(query, word_tokens)
+    
+    def find_relevant_paragraphs_batch(self,
+                                       queries: List[str],
+                                       paragraphs: List[Dict[str, Any]],
+                                       top_k: int = 5,
+                                       context_paragraphs: int = 5,
+                                       index: Optional[SearchIndex] = None,
+                                       scorer: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """Answer many queries against one document, scoring the whole batch at once
         
-        # Create TF-IDF matrix
-        try:
-            tfidf_matrix = self.vectorizer.fit_transform(all_texts)
-        except ValueError:
-            # Fallback to simple keyword matching if TF-IDF fails
-            return self._keyword_fallback(query, paragraphs, top_k, context_paragraphs)
+        "Quoted phrases" and `a NEAR/k b` clauses restrict the results to the
+        paragraphs matching all of them, ranked by the scorer on the rest of
+        the question; such exact matches are returned whatever their score.
+        """
+        selected_scorer = self.get_scorer(scorer)
+        if not paragraphs:
+            return [[] for _ in queries]
         
-        # Calculate similarities
-        query_vector = tfidf_matrix[0]
-        paragraph_vectors = tfidf_matrix[1:]
+        # Documents stored with an index skip building it entirely
+        if index is None:
+            index = self.build_index(paragraphs)
         
-        similarities = cosine_similarity(query_vector, paragraph_vectors).flatten()
+        parsed = [self.parse_query(query) for query in queries]
         
-        # Get top k most similar paragraphs
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        # One column of scores per query
+        with metrics.stage('search.score'):
+            scores = selected_scorer.score([query.text for query in parsed], index)
         
         results = []
-        for idx in top_indices:
-            if similarities[idx] > 0.1:  # Minimum similarity threshold
-                paragraph = paragraphs[idx]
-                
-                # Get context paragraphs (before and after)
-                context_before = self._get_context_paragraphs(
-                    paragraphs, idx, -context_paragraphs, 0
-                )
-                context_after = self._get_context_paragraphs(
-                    paragraphs, idx, 1, context_paragraphs + 1
-                )
-                
-                results.append({
-                    'paragraph': paragraph,
-                    'similarity_score': float(similarities[idx]),
-                    'context_before': context_before,
-                    'context_after': context_after
-                })
+        for column, query in enumerate(parsed):
+            column_scores, min_score = scores[:, column], selected_scorer.min_score
+            if query.clauses:
+                with metrics.stage('search.phrase'):
+                    matches = self.positional_index(index, paragraphs).matches(
+                        index.terms, query.clauses, index.paragraph_count
+                    )
+                column_scores = np.where(matches, column_scores, -np.inf)
+                min_score = -np.inf
+            with metrics.stage('search.select'):
+                results.append(self._select_results(
+                    column_scores, paragraphs, top_k, context_paragraphs, min_score
+                ))
+        return results
+    
+    def positional_index(self, index: SearchIndex, paragraphs: List[Dict[str, Any]]) -> PositionalIndex:
+        """Positions of the index, built once from the text for documents stored without them"""
+        if index.positions is None:
+            index.positions = PositionalIndex.build([word_tokens(p['text']) for p in paragraphs], index.terms)
+        return index.positions
+    
+    def _select_results(self,
+                        scores: np.ndarray,
+                        paragraphs: List[Dict[str, Any]],
+                        top_k: int,
+                        context_paragraphs: int,
+                        min_score: float) -> List[Dict[str, Any]]:
+        """Pick the top k paragraphs above the score threshold and add their context"""
+        results = []
+        for idx in top_k_indices(scores, top_k):
+            if scores[idx] > min_score:
+                results.append(self.expand_context(
+                    paragraphs, idx, float(scores[idx]), context_paragraphs
+                ))
         
         return results
     
-    def _get_context_paragraphs(self, 
-                              paragraphs: List[Dict[str, Any]], 
-                              center_idx: int, 
-                              start_offset: int, 
+    def expand_context(self,
+                       paragraphs: List[Dict[str, Any]],
+                       idx: int,
+                       score: float,
+                       context_paragraphs: int) -> Dict[str, Any]:
+        """Build a result for one hit with its surrounding paragraphs"""
+        return {
+            'paragraph': paragraphs[idx],
+            'position': int(idx),  # Row of the paragraph within the document
+            'similarity_score': score,
+            'context_before': self._get_context_paragraphs(
+                paragraphs, idx, -context_paragraphs, 0
+            ),
+            'context_after': self._get_context_paragraphs(
+                paragraphs, idx, 1, context_paragraphs + 1
+            )
+        }
+    
+    def _get_context_paragraphs(self,
+                              paragraphs: List[Dict[str, Any]],
+                              center_idx: int,
+                              start_offset: int,
                               end_offset: int) -> List[Dict[str, Any]]:
         """Get paragraphs before or after the target paragraph"""
         context = []
@@ -79,36 +579,18 @@ class SimilaritySearch:
                 context.append(paragraphs[context_idx])
         
         return context
-    
-    def _keyword_fallback(self, 
-                         query: str, 
-                         paragraphs: List[Dict[str, Any]], 
-                         top_k: int,
-                         context_paragraphs: int) -> List[Dict[str, Any]]:
-        """Fallback method using simple keyword matching"""
-        query_terms = set(re.findall(r'\w+', query.lower()))
-        
-        scored_paragraphs = []
-        for idx, paragraph in enumerate(paragraphs):
-            para_terms = set(re.findall(r'\w+', paragraph['text'].lower()))
-            common_terms = query_terms.intersection(para_terms)
-            score = len(common_terms) / len(query_terms) if query_terms else 0
-            
-            if score > 0:
-                context_before = self._get_context_paragraphs(
-                    paragraphs, idx, -context_paragraphs, 0
-                )
-                context_after = self._get_context_paragraphs(
-                    paragraphs, idx, 1, context_paragraphs + 1
-                )
-                
-                scored_paragraphs.append({
-                    'paragraph': paragraph,
-                    'similarity_score': score,
-                    'context_before': context_before,
-                    'context_after': context_after
-                })
-        
-        # Sort by score and return top k
-        scored_paragraphs.sort(key=lambda x: x['similarity_score'], reverse=True)
-        return scored_paragraphs[:top_k]
\ No newline at end of file
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, using partial selection instead of a full sort"""
+    if k <= 0 or len(scores) == 0:
+        return np.array([], dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+def l2_normalize(matrix: csr_matrix) -> csr_matrix:
+    """Scale rows to unit length, leaving empty rows as they are"""
+    from sklearn.preprocessing import normalize
+    return normalize(matrix)
@@ -0,0 +1,58 @@
+import random
+
+import numpy as np
+import pytest
+
+from similarity_search import SimilaritySearch
+
+QUESTIONS = [
+    'limitation of liability',
+    'termination notice period',
+    'payment of fees',
+    'confidential information disclosure',
+    'governing law'
+]
+
+WORDS = (
+    'liability limitation damages termination notice period payment fees invoice '
+    'confidential information disclosure governing law court party agreement license '
+    'warranty software data breach remedy'
+).split()
+
+def paragraphs(seed: int, count: int):
+    rng = random.Random(seed)
+    return [
+        {'text': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 30))), 'page': 1, 'paragraph_index': i}
+        for i in range(count)
+    ]
+
+@pytest.mark.parametrize('scorer', ['tfidf', 'bm25', 'keyword'])
+@pytest.mark.parametrize('batch_size', [1, 7, 50])
+@pytest.mark.parametrize('max_features', [1000, 40])
+def test_snapshot_ranks_like_build_index(scorer, batch_size, max_features):
+    similarity_search = SimilaritySearch(lsa_dimensions=0)
+    similarity_search.vectorizer_params['max_features'] = max_features  # 40 prunes the vocabulary
+    document = paragraphs(batch_size, 120)
+    incremental = similarity_search.incremental_index()
+    for start in range(0, len(document), batch_size):
+        incremental.add([p['text'] for p in document[start:start + batch_size]])
+        covered = document[:start + batch_size]
+        
+        expected = similarity_search.get_scorer(scorer).score(QUESTIONS, similarity_search.build_index(covered))
+        actual = similarity_search.get_scorer(scorer).score(QUESTIONS, incremental.snapshot())
+        np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-12)
+
+def test_snapshot_answers_phrases_like_build_index():
+    similarity_search = SimilaritySearch(lsa_dimensions=0)
+    document = paragraphs(1, 80)
+    incremental = similarity_search.incremental_index()
+    incremental.add([p['text'] for p in document])
+    
+    question = '"limitation damages" OR liability NEAR/2 fees'
+    expected = similarity_search.find_relevant_paragraphs(
+        question, document, top_k=10, context_paragraphs=0, index=similarity_search.build_index(document)
+    )
+    actual = similarity_search.find_relevant_paragraphs(
+        question, document, top_k=10, context_paragraphs=0, index=incremental.snapshot()
+    )
+    assert [r['position'] for r in actual] == [r['position'] for r in expected]
@@ -0,0 +1,90 @@
+import random
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+
+from positional_index import PositionalIndex, Phrase, Near, parse_query
+from similarity_search import word_tokens
+
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'epsilon']
+
+def random_paragraphs(seed: int, count: int = 60) -> List[List[str]]:
+    # A small vocabulary, so phrases and near pairs occur often enough to be tested
+    rng = random.Random(seed)
+    return [[rng.choice(WORDS) for _ in range(rng.randint(0, 25))] for _ in range(count)]
+
+def starts(tokens: List[str], words: Tuple[str, ...]) -> List[int]:
+    return [i for i in range(len(tokens) - len(words) + 1) if tuple(tokens[i:i + len(words)]) == words]
+
+def scan_phrase(tokens: List[str], words: Tuple[str, ...]) -> bool:
+    return bool(starts(tokens, words))
+
+def scan_near(tokens: List[str], clause: Near) -> bool:
+    def followed(first: Tuple[str, ...], second: Tuple[str, ...]) -> bool:
+        return any(
+            0 <= j - (i + len(first)) <= clause.distance
+            for i in starts(tokens, first) for j in starts(tokens, second)
+        )
+    return followed(clause.left, clause.right) or followed(clause.right, clause.left)
+
+def build(paragraphs: List[List[str]]) -> Tuple[PositionalIndex, dict]:
+    terms = {}
+    for tokens in paragraphs:
+        for token in tokens:
+            terms.setdefault(token, len(terms))
+    return PositionalIndex.build(paragraphs, terms), terms
+
+def random_words(rng: random.Random, max_length: int) -> Tuple[str, ...]:
+    return tuple(rng.choice(WORDS + ['missing']) for _ in range(rng.randint(1, max_length)))
+
+@pytest.mark.parametrize('seed', range(5))
+def test_phrases_match_a_scan(seed):
+    paragraphs = random_paragraphs(seed)
+    index, terms = build(paragraphs)
+    rng = random.Random(seed + 100)
+    for _ in range(50):
+        clause = Phrase(random_words(rng, 3))
+        expected = [scan_phrase(tokens, clause.words) for tokens in paragraphs]
+        assert index.matches(terms, (clause,), len(paragraphs)).tolist() == expected, clause
+
+@pytest.mark.parametrize('seed', range(5))
+def test_near_matches_a_scan(seed):
+    paragraphs = random_paragraphs(seed)
+    index, terms = build(paragraphs)
+    rng = random.Random(seed + 200)
+    for _ in range(50):
+        clause = Near(random_words(rng, 2), random_words(rng, 2), rng.randint(0, 4))
+        expected = [scan_near(tokens, clause) for tokens in paragraphs]
+        assert index.matches(terms, (clause,), len(paragraphs)).tolist() == expected, clause
+
+def test_clauses_are_combined():
+    paragraphs = random_paragraphs(7)
+    index, terms = build(paragraphs)
+    clauses = (Phrase(('alpha', 'beta')), Near(('gamma',), ('delta',), 1))
+    expected = [
+        scan_phrase(tokens, clauses[0].words) and scan_near(tokens, clauses[1]) for tokens in paragraphs
+    ]
+    assert index.matches(terms, clauses, len(paragraphs)).tolist() == expected
+
+def test_stored_arrays_answer_the_same():
+    paragraphs = random_paragraphs(3)
+    index, terms = build(paragraphs)
+    restored = PositionalIndex.from_arrays(index.to_arrays())
+    clause = Near(('alpha',), ('beta', 'gamma'), 2)
+    assert np.array_equal(
+        restored.matches(terms, (clause,), len(paragraphs)), index.matches(terms, (clause,), len(paragraphs))
+    )
+
+def test_parse_query():
+    query = parse_query('"Limitation of Liability" caps  liability NEAR/3 damages', word_tokens)
+    assert query.clauses == (
+        Near(('liability',), ('damages',), 3),
+        Phrase(('limitation', 'of', 'liability'))
+    )
+    assert query.text == 'Limitation of Liability caps  liability damages'
+
+def test_lower_case_near_is_text():
+    query = parse_query('liability near/3 damages', word_tokens)
+    assert query.clauses == ()
+    assert query.text == 'liability near/3 damages'
@@ -1,12 +1,119 @@
-import PyPDF2
-import pdfplumber
-from docx import Document
 import re
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Iterable, Optional
+from concurrent.futures import Executor
+from itertools import repeat
+import importlib
 import os
 
+from segmenter import Segmenter, PDF_SEPARATOR, BLANK_LINE_SEPARATOR
+from instrumentation import metrics
+
+# Libraries each format needs. They are imported on first use of the format,
+# so processes that never extract a PDF or DOCX never load them.
+FORMAT_LIBRARIES = {
+    'application/pdf': ['pdfplumber', 'PyPDF2'],
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': ['docx'],
+    'application/msword': ['docx'],
+    'text/plain': []
+}
+
+def extract_pdf_pages(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract text of pages [start, end) as (page number, text) pairs
+    
+    Module-level so it can run in a worker process. pdfplumber is tried
+    first and PyPDF2 only takes over for the pages it fails on.
+    """
+    import pdfplumber
+    import PyPDF2
+    
+    pages = []
+    fallback_file = None
+    fallback_reader = None
+    
+    try:
+        pdf = pdfplumber.open(file_path)
+    except Exception as e:
+        print(f"pdfplumber failed, using PyPDF2: {e}")
+        pdf = None
+    
+    try:
+        for page_index in range(start, end):
+            if pdf is not None:
+                try:
+                    # Use pdfplumber for better text extraction with coordinates
+                    with metrics.stage('extract.pdfplumber'):
+                        text = pdf.pages[page_index].extract_text() or ''
+                    pages.append((page_index + 1, text))
+                    continue
+                except Exception as e:
+                    print(f"pdfplumber failed on page {page_index + 1}, using PyPDF2: {e}")
+            
+            # Fallback to PyPDF2 for this page only
+            with metrics.stage('extract.pypdf2'):
+                if fallback_reader is None:
+                    fallback_file = open(file_path, 'rb')
+                    fallback_reader = PyPDF2.PdfReader(fallback_file)
+                text = fallback_reader.pages[page_index].extract_text() or ''
+            pages.append((page_index + 1, text))
+    finally:
+        if pdf is not None:
+            pdf.close()
+        if fallback_file is not None:
+            fallback_file.close()
+    
+    return pages
+
+def extract_pdf_pages_timed(file_path: str, start: int, end: int) -> Tuple[List[Tuple[int, str]], List[Tuple[str, float]]]:
+    """extract_pdf_pages for a worker process, also returning the stage timings it recorded there"""
+    with metrics.collect() as timings:
+        pages = extract_pdf_pages(file_path, start, end)
+    return pages, timings
+
+class PdfPageMerger:
+    """Combines extracted PDF pages, in page order, into document data
+    
+    Pages can be added in batches as they are extracted; each batch is
+    segmented right away so its paragraphs are usable before the rest arrive.
+    """
+    def __init__(self, segmenter: Segmenter):
+        self.segmenter = segmenter
+        self.paragraphs: List[Dict[str, Any]] = []
+        self.page_texts: List[str] = []
+        self.pages_covered = 0  # Highest page number added so far
+        self.offset = 0  # Start of the next page within full_text
+    
+    def add_pages(self, pages: Iterable[Tuple[int, str]]) -> List[Dict[str, Any]]:
+        """Segment the next pages and return their paragraphs"""
+        start = len(self.paragraphs)
+        with metrics.stage('extract.segment'):
+            for page_num, text in pages:
+                self.pages_covered = max(self.pages_covered, page_num)
+                if text:
+                    self.page_texts.append(text)
+                    self.paragraphs.extend(self.segmenter.paragraphs(text, page_num, self.offset))
+                    self.offset += len(text) + 1  # +1 for the newline joining pages
+        return self.paragraphs[start:]
+    
+    def result(self) -> Dict[str, Any]:
+        return {
+            'full_text': "\n".join(self.page_texts).rstrip(),
+            'paragraphs': self.paragraphs,
+            'total_pages': len(self.paragraphs) and max(p['page'] for p in self.paragraphs) or 0
+        }
+
 class TextProcessor:
-    def __init__(self):
+    def __init__(self,
+                 executor: Optional[Executor] = None,
+                 pages_per_chunk: int = 50,
+                 pdf_min_length: int = 20,
+                 text_min_length: int = 10):
+        # Optional process pool used to extract large PDFs in page ranges
+        self.executor = executor
+        self.pages_per_chunk = pages_per_chunk
+        # Minimum paragraph lengths are in characters, after trimming whitespace
+        self.pdf_segmenter = Segmenter(PDF_SEPARATOR, pdf_min_length)
+        self.txt_segmenter = Segmenter(BLANK_LINE_SEPARATOR, text_min_length)
+        self.docx_segmenter = Segmenter(None, text_min_length)  # One DOCX paragraph per piece
         self.supported_formats = {
             'application/pdf': self._extract_from_pdf,
             'application/vnd.openxmlformats-officedocument.wordprocessingml.document': self._extract_from_docx,
@@ -14,6 +121,12 @@ class TextProcessor:
             'text/plain': self._extract_from_txt
         }
     
+    def warm_up(self, mime_types: Optional[Iterable[str]] = None) -> None:
+        """Import the libraries of the given formats (all by default) ahead of the first upload"""
+        for mime_type in mime_types or self.supported_formats:
+            for library in FORMAT_LIBRARIES[mime_type]:
+                importlib.import_module(library)
+    
     def extract_text_with_metadata(self, file_path: str, mime_type: str) -> Dict[str, Any]:
         """Extract text with paragraph-level metadata and page numbers"""
         if mime_type not in self.supported_formats:
@@ -23,81 +136,80 @@ class TextProcessor:
     
     def _extract_from_pdf(self, file_path: str) -> Dict[str, Any]:
         """Extract text from PDF with page numbers and paragraph positioning"""
-        paragraphs = []
-        full_text = ""
+        page_count = self.count_pdf_pages(file_path)
+        
+        if self.executor is not None and page_count > self.pages_per_chunk:
+            # Page ranges are extracted in worker processes; map keeps them in page order
+            starts, ends = zip(*self.pdf_page_ranges(page_count))
+            chunks = []
+            for pages, timings in self.executor.map(extract_pdf_pages_timed, repeat(file_path), starts, ends):
+                chunks.append(pages)
+                metrics.record_all(timings)
+        else:
+            chunks = [extract_pdf_pages(file_path, 0, page_count)]
+        
+        return self.merge_pdf_pages(page for chunk in chunks for page in chunk)
+    
+    def pdf_page_ranges(self, page_count: int) -> List[Tuple[int, int]]:
+        """[start, end) page ranges of at most pages_per_chunk pages"""
+        return [
+            (start, min(start + self.pages_per_chunk, page_count))
+            for start in range(0, page_count, self.pages_per_chunk)
+        ]
+    
+    def pdf_merger(self) -> PdfPageMerger:
+        return PdfPageMerger(self.pdf_segmenter)
+    
+    def merge_pdf_pages(self, pages: Iterable[Tuple[int, str]]) -> Dict[str, Any]:
+        """Combine extracted (page number, text) pairs into document data"""
+        merger = self.pdf_merger()
+        merger.add_pages(pages)
+        return merger.result()
+    
+    def count_pdf_pages(self, file_path: str) -> int:
+        """Number of pages in a PDF"""
+        import pdfplumber
+        import PyPDF2
         
         try:
-            # Use pdfplumber for better text extraction with coordinates
             with pdfplumber.open(file_path) as pdf:
-                for page_num, page in enumerate(pdf.pages, 1):
-                    text = page.extract_text()
-                    if text:
-                        full_text += text + "\n"
-                        # Split into paragraphs (simple approach)
-                        page_paragraphs = self._split_into_paragraphs(text, page_num)
-                        paragraphs.extend(page_paragraphs)
-        except Exception as e:
-            # Fallback to PyPDF2
-            print(f"pdfplumber failed, using PyPDF2: {e}")
+                return len(pdf.pages)
+        except Exception:
             with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page_num, page in enumerate(pdf_reader.pages, 1):
-                    text = page.extract_text()
-                    if text:
-                        full_text += text + "\n"
-                        page_paragraphs = self._split_into_paragraphs(text, page_num)
-                        paragraphs.extend(page_paragraphs)
-        
-        return {
-            'full_text': full_text.strip(),
-            'paragraphs': paragraphs,
-            'total_pages': len(paragraphs) and max(p['page'] for p in paragraphs) or 0
-        }
+                return len(PyPDF2.PdfReader(file).pages)
     
     def _extract_from_docx(self, file_path: str) -> Dict[str, Any]:
         """Extract text from DOCX with paragraph metadata"""
-        doc = Document(file_path)
+        from docx import Document
+        
+        with metrics.stage('extract.read'):
+            doc = Document(file_path)
         paragraphs = []
-        full_text = ""
+        texts = []
+        offset = 0  # Start of the current DOCX paragraph within full_text
         
-        # DOCX doesn't have page numbers, so we'll use paragraph indices
-        for para_num, paragraph in enumerate(doc.paragraphs, 1):
-            text = paragraph.text.strip()
-            if text and len(text) > 10:  # Minimum paragraph length
-                full_text += text + "\n"
-                paragraphs.append({
-                    'text': text,
-                    'page': para_num,  # Using paragraph number as pseudo-page
-                    'paragraph_index': para_num,
-                    'start_position': len(full_text) - len(text),
-                    'end_position': len(full_text)
-                })
+        # DOCX doesn't have page numbers, so we'll use paragraph indices as pseudo-pages
+        with metrics.stage('extract.segment'):
+            for para_num, paragraph in enumerate(doc.paragraphs, 1):
+                text = paragraph.text
+                texts.append(text)
+                paragraphs.extend(self.docx_segmenter.paragraphs(text, para_num, offset, para_num))
+                offset += len(text) + 1
         
         return {
-            'full_text': full_text.strip(),
+            'full_text': "\n".join(texts).rstrip(),
             'paragraphs': paragraphs,
             'total_pages': len(paragraphs)
         }
     
     def _extract_from_txt(self, file_path: str) -> Dict[str, Any]:
         """Extract text from TXT files"""
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
+        with metrics.stage('extract.read'), open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
             full_text = file.read()
         
-        paragraphs = []
-        # Split by double newlines (common paragraph separator)
-        raw_paragraphs = re.split(r'\n\s*\n', full_text)
-        
-        for para_num, para_text in enumerate(raw_paragraphs, 1):
-            text = para_text.strip()
-            if text and len(text) > 10:
-                paragraphs.append({
-                    'text': text,
-                    'page': 1,  # TXT files don't have pages
-                    'paragraph_index': para_num,
-                    'start_position': full_text.find(text),
-                    'end_position': full_text.find(text) + len(text)
-                })
+        # Split by double newlines (common paragraph separator); TXT files don't have pages
+        with metrics.stage('extract.segment'):
+            paragraphs = list(self.txt_segmenter.paragraphs(full_text, 1))
         
         return {
             'full_text': full_text,
@@ -105,35 +217,6 @@ class TextProcessor:
             'total_pages': 1
         }
     
-    def _split_into_paragraphs(self, text: str, page_num: int) -> List[Dict[str, Any]]:
-        """Split text into paragraphs with metadata"""
-        paragraphs = []
-        
-        # Multiple strategies for paragraph detection
-        paragraph_separators = [
-            r'\n\s*\n',  # Double newlines
-            r'\n(?=\s*[A-Z])',  # Newline followed by capital letter
-            r'(?<=[.!?])\s+\n',  # End of sentence followed by newline
-        ]
-        
-        combined_pattern = '|'.join(paragraph_separators)
-        raw_paragraphs = re.split(combined_pattern, text)
-        
-        current_position = 0
-        for para_num, para_text in enumerate(raw_paragraphs, 1):
-            text = para_text.strip()
-            if text and len(text) > 20:  # Minimum character count for a paragraph
-                paragraphs.append({
-                    'text': text,
-                    'page': page_num,
-                    'paragraph_index': para_num,
-                    'start_position': current_position,
-                    'end_position': current_position + len(text)
-                })
-            current_position += len(para_text) + 1  # +1 for the separator
-        
-        return paragraphs
-    
     def get_first_sentence(self, text: str, max_length: int = 100) -> str:
         """Extract first sentence for document identification"""
         # Simple sentence extraction
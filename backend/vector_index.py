@@ -0,0 +1,141 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from typing import Dict, Any, List, Optional, Tuple
+
+# Below this many paragraphs every query scores all vectors; IVF clustering only pays off beyond it
+MIN_CLUSTERED_PARAGRAPHS = 256
+
+class VectorIndex:
+    """Dense LSA paragraph vectors with an inverted-file (IVF) index for approximate search
+    
+    Paragraph TF-IDF rows are projected onto the top singular vectors of the
+    document's TF-IDF matrix (latent semantic analysis), so paragraphs using
+    related rather than identical terms end up close together. The vectors are
+    grouped by spherical k-means into about sqrt(n) clusters; a query scores
+    only the paragraphs of its nearest clusters.
+    
+    Everything is fitted per document. The TF-IDF matrix behind the projection
+    has a vocabulary of its own, far larger than the TF-IDF scorer's: the rarer
+    terms that scorer's cap drops are much of what relates paragraphs.
+    """
+    def __init__(self,
+                 vocabulary: Dict[str, int],
+                 idf: np.ndarray,
+                 components: np.ndarray,
+                 vectors: np.ndarray,
+                 centroids: np.ndarray,
+                 offsets: np.ndarray,
+                 rows: np.ndarray):
+        self.vocabulary = vocabulary  # term -> column of the LSA TF-IDF vectors
+        self.idf = idf
+        self.components = components  # (dimensions, vocabulary) float32 projection of TF-IDF vectors
+        self.vectors = vectors  # (paragraphs, dimensions) float32 unit rows, one contiguous block
+        self.centroids = centroids  # (clusters, dimensions) float32 unit rows
+        # Paragraphs of cluster c are rows[offsets[c]:offsets[c + 1]]
+        self.offsets = offsets
+        self.rows = rows
+    
+    @property
+    def cluster_count(self) -> int:
+        return len(self.centroids)
+    
+    @classmethod
+    def build(cls,
+              texts: List[str],
+              vectorizer_params: Dict[str, Any],
+              dimensions: int = 100,
+              seed: int = 0) -> Optional['VectorIndex']:
+        """Fit TF-IDF and LSA on a document's paragraphs and cluster the paragraph vectors"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        
+        vectorizer = TfidfVectorizer(**vectorizer_params)
+        try:
+            matrix = vectorizer.fit_transform(texts).tocsr()
+        except ValueError:
+            return None  # No usable vocabulary
+        paragraph_count, vocabulary_size = matrix.shape
+        dimensions = min(dimensions, paragraph_count - 1, vocabulary_size - 1)
+        if dimensions < 2:
+            return None  # Too small for a meaningful projection
+        
+        from sklearn.decomposition import TruncatedSVD
+        
+        svd = TruncatedSVD(dimensions, algorithm='randomized', random_state=seed)
+        vectors = unit_rows(svd.fit_transform(matrix).astype(np.float32))
+        components = np.ascontiguousarray(svd.components_, dtype=np.float32)
+        
+        cluster_count = int(np.sqrt(paragraph_count)) if paragraph_count >= MIN_CLUSTERED_PARAGRAPHS else 1
+        centroids, assignment = spherical_kmeans(vectors, cluster_count, seed)
+        rows = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(cluster_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=cluster_count), out=offsets[1:])
+        vocabulary = {term: int(col) for term, col in vectorizer.vocabulary_.items()}
+        return cls(vocabulary, vectorizer.idf_, components, vectors, centroids, offsets, rows)
+    
+    def project(self, queries: csr_matrix) -> np.ndarray:
+        """LSA unit vectors for L2-normalized TF-IDF query rows"""
+        return unit_rows(np.asarray(queries @ self.components.T, dtype=np.float32))
+    
+    def search(self, query: np.ndarray, probes: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows and cosine similarities of the paragraphs in the query's `probes` nearest clusters"""
+        if probes >= self.cluster_count:
+            return np.arange(len(self.vectors)), self.vectors @ query
+        
+        clusters = np.argpartition(self.centroids @ query, -probes)[-probes:]
+        rows = np.concatenate([self.rows[self.offsets[c]:self.offsets[c + 1]] for c in clusters])
+        return rows, self.vectors[rows] @ query
+    
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'lsa_idf': self.idf,
+            'lsa_components': self.components,
+            'lsa_vectors': self.vectors,
+            'ivf_centroids': self.centroids,
+            'ivf_offsets': self.offsets,
+            'ivf_rows': self.rows
+        }
+    
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], terms: Optional[List[str]]) -> Optional['VectorIndex']:
+        """Rebuild around (possibly memory-mapped) stored arrays and the LSA term list
+        
+        None if the index had no vectors, or vectors projected from the TF-IDF
+        scorer's vocabulary, which are no longer used.
+        """
+        if 'lsa_vectors' not in arrays or terms is None:
+            return None
+        return cls(
+            {term: col for col, term in enumerate(terms)},
+            arrays['lsa_idf'],
+            arrays['lsa_components'],
+            arrays['lsa_vectors'],
+            arrays['ivf_centroids'],
+            arrays['ivf_offsets'],
+            arrays['ivf_rows']
+        )
+
+def spherical_kmeans(vectors: np.ndarray,
+                     cluster_count: int,
+                     seed: int = 0,
+                     iterations: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster unit vectors by cosine similarity, returning unit centroids and each row's cluster"""
+    if cluster_count <= 1:
+        return unit_rows(vectors.sum(axis=0, keepdims=True)), np.zeros(len(vectors), dtype=np.int64)
+    
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), cluster_count, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        # A cluster that lost all its members keeps its previous centroid
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]
+        centroids = unit_rows(sums)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+def unit_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale dense rows to unit length, leaving zero rows as they are"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)